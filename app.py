@@ -1,23 +1,45 @@
+import math
 import os
 import re
-import ssl
-import smtplib
-from urllib.parse import urlparse
-from email.message import EmailMessage
+from functools import lru_cache
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, abort, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import psycopg2
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-import google.generativeai as genai
+
+import exports
+import db
+import http_cache
+import llm
+import metrics
+import profiling
+import queries
+import ratelimit
+import response_encoding
+import sessions
+from chat_memory import ChatMemory
 
 # ----------------- Setup & Config -----------------
 load_dotenv()
 
 app = Flask(__name__)
 
+# Behind Render / nginx: trust RATE_LIMIT_PROXY_HOPS X-Forwarded-For entries so
+# request.remote_addr (rate-limit buckets, logs) is the client, not the proxy
+if ratelimit.PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=ratelimit.PROXY_HOPS)
+
+# Prometheus /metrics, per-phase timings and optional Server-Timing headers
+metrics.init_app(app)
+# Opt-in sampling profiler / slow-request capture (PROFILE_* env vars)
+profiling.init_app(app)
+# orjson provider + gzip/brotli compression (registered last so metrics see wire sizes)
+response_encoding.init_app(app)
+
 # CORS: env-driven; multiple origins allowed (comma-separated)
 ALLOWED_ORIGINS = os.getenv(
     "CORS_ORIGINS",
@@ -29,14 +51,6 @@ CORS(
     supports_credentials=True
 )
 
-# Google Gemini
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("No GOOGLE_API_KEY set for Flask application")
-genai.configure(api_key=GOOGLE_API_KEY)
-system_instruction = "You are a sophisticated Personalized Fashion Stylist AI, designed specifically for a Pakistani audience."
-model = genai.GenerativeModel(model_name="gemini-1.5-flash", system_instruction=system_instruction)
-
 # Uploads (ephemeral unless you mount a disk on Render)
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -50,29 +64,43 @@ EMAIL_REGEX = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_db_connection():
+def request_user(data=None):
     """
-    Prefer DATABASE_URL (Render/Heroku style). Fallback to discrete env vars for local dev.
-    On Render, sslmode=require is important.
+    (user_id, email, claims) for the caller. A session token wins; otherwise fall
+    back to the legacy email field from the JSON body / query string (no id, no claims)
+    unless REQUIRE_SESSION_TOKEN is set.
     """
-    db_url = os.getenv("DATABASE_URL")
-    if db_url:
-        u = urlparse(db_url)
-        return psycopg2.connect(
-            dbname=u.path.lstrip("/"),
-            user=u.username,
-            password=u.password,
-            host=u.hostname,
-            port=u.port or 5432,
-            sslmode="require",
-        )
-    # Local dev fallback (no hardcoded password defaults)
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        database=os.getenv("DB_NAME", "Palleteandfit"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASS", "")
+    claims = sessions.current()
+    if claims:
+        return claims["uid"], claims["email"], claims
+    if sessions.REQUIRED:
+        abort(401, description="Session token required")
+    source = data if data is not None else request.args
+    return None, source.get("email"), None
+
+def session_token_for(row):
+    """row = (id, username, *queries.PROFILE_COLUMNS)"""
+    return sessions.issue(row[0], row[1], dict(zip(sessions.PROFILE_CLAIMS, row[2:])))
+
+db_pool = db.ConnectionPool(
+    lambda: psycopg2.connect(
+        **db.connect_params(), connection_factory=db.Connection, cursor_factory=metrics.TimedCursor
     )
+)
+
+def get_db_connection():
+    """
+    A pooled connection (DATABASE_URL or DB_* env vars, see db.connect_params);
+    conn.close() returns it to the pool.
+    """
+    with metrics.timed("db_acquire"):
+        return db_pool.getconn()
+
+@lru_cache(maxsize=1)
+def _smtp_ssl_context():
+    # loading the CA bundle is the expensive part; do it once per worker, on first use
+    import ssl
+    return ssl.create_default_context()
 
 def send_support_email(sender_email: str, message_text: str):
     host = (os.getenv("SMTP_HOST") or "").strip()
@@ -86,6 +114,10 @@ def send_support_email(sender_email: str, message_text: str):
     if not (host and user and pwd):
         return False, "SMTP not configured"
 
+    # imported lazily: only the contact route needs the mail stack
+    import smtplib
+    from email.message import EmailMessage
+
     try:
         msg = EmailMessage()
         msg["Subject"] = f"New contact message from {sender_email}"
@@ -94,8 +126,8 @@ def send_support_email(sender_email: str, message_text: str):
         msg["Reply-To"] = sender_email
         msg.set_content(f"From: {sender_email}\n\n{message_text}")
 
-        ctx = ssl.create_default_context()
-        with smtplib.SMTP(host, port, timeout=30) as s:
+        ctx = _smtp_ssl_context()
+        with metrics.timed("smtp"), smtplib.SMTP(host, port, timeout=30) as s:
             s.ehlo()
             if use_tls:
                 s.starttls(context=ctx)
@@ -108,7 +140,27 @@ def send_support_email(sender_email: str, message_text: str):
         print("SMTP ERROR:", e)
         return False, str(e)
 
+# Stylist chat sessions (rolling window + summary over chatbot_logs)
+chat_memory = ChatMemory(get_db_connection)
+
+# ETag validators for read routes (table versions from cache_versions)
+http_cache.init(get_db_connection)
+
 # ----------------- Routes -----------------
+@app.errorhandler(401)
+def unauthorized(e):
+    return jsonify({"error": e.description}), 401
+
+@app.errorhandler(db.PoolTimeout)
+def pool_exhausted(e):
+    # every pooled connection stayed checked out for DB_POOL_TIMEOUT: shed like
+    # ratelimit's in-flight cap instead of surfacing a 500
+    print("Database pool exhausted:", e)
+    response = jsonify({"error": "Service is busy, please retry shortly"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(max(1, math.ceil(ratelimit.SHED_RETRY_AFTER)))
+    return response
+
 @app.route("/uploads/<filename>")
 def uploaded_file(filename):
     return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
@@ -119,6 +171,7 @@ def hello():
 
 # ---------- Auth ----------
 @app.route("/api/register", methods=["POST"])
+@ratelimit.limit("auth")
 def register():
     data = request.get_json() or {}
     username = data.get("username")
@@ -140,23 +193,27 @@ def register():
         hashed_pw = generate_password_hash(password)
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO users
-                      (username, password, phone, name, age, gender, skin_tone, weight, body_length, upper_width, lower_width)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    RETURNING id;
-                    """,
+                queries.run(
+                    cur,
+                    queries.USER_INSERT,
                     (username, hashed_pw, phone, name, age, gender, skin_tone, weight, body_length, upper_width, lower_width)
                 )
                 user_id = cur.fetchone()[0]
-                return jsonify({"id": user_id, "username": username}), 201
+                payload = {"id": user_id, "username": username}
+                # signup continues straight into the profile steps, so it gets a token too
+                token = sessions.issue(user_id, username, data)
+                if token:
+                    payload["token"] = token
+                return jsonify(payload), 201
     except psycopg2.IntegrityError:
         return jsonify({"error": "User with this email already exists."}), 409
+    except db.PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/login", methods=["POST"])
+@ratelimit.limit("auth")
 def login():
     data = request.get_json() or {}
     email = data.get("email")
@@ -166,14 +223,20 @@ def login():
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("SELECT password FROM users WHERE username=%s", (email,))
+        queries.run(cur, queries.LOGIN_LOOKUP, (email,))
         row = cur.fetchone()
         cur.close()
         conn.close()
         if row and check_password_hash(row[0], password):
-            return jsonify({"success": True}), 200
+            payload = {"success": True, "user_id": row[1]}
+            token = session_token_for(row[1:])
+            if token:
+                payload["token"] = token
+            return jsonify(payload), 200
         else:
             return jsonify({"error": "Invalid email or password"}), 401
+    except db.PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -181,7 +244,7 @@ def login():
 @app.route("/api/profile", methods=["POST"])
 def profile():
     data = request.get_json() or {}
-    email = data.get("email")
+    user_id, email, claims = request_user(data)
     name = data.get("name")
     age = data.get("age")
     gender = data.get("gender")
@@ -194,43 +257,40 @@ def profile():
 
     if not email:
         return jsonify({"error": "Missing email"}), 400
+    stmt, key = queries.by_user(queries.PROFILE_UPDATE, user_id, email)
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute(
-            """
-            UPDATE users SET
-              name=%s, age=%s, gender=%s, skin_tone=%s,
-              weight=%s, body_length=%s, upper_width=%s, lower_width=%s, phone=%s
-            WHERE username=%s
-            """,
-            (name, age, gender, skin_tone, weight, body_length, upper_width, lower_width, phone, email)
+        queries.run(
+            cur,
+            stmt,
+            (name, age, gender, skin_tone, weight, body_length, upper_width, lower_width, phone, key)
         )
+        row = cur.fetchone()
         conn.commit()
         cur.close()
         conn.close()
-        return jsonify({"success": True}), 200
+        payload = {"success": True}
+        if claims and row:
+            # profile claims changed: hand back a refreshed token
+            payload["token"] = session_token_for(row)
+        return jsonify(payload), 200
+    except db.PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @app.route("/api/get_profile", methods=["POST"])
 def get_profile():
     data = request.get_json() or {}
-    email = data.get("email")
+    user_id, email, _ = request_user(data)
     if not email:
         return jsonify({"error": "Missing email"}), 400
+    stmt, key = queries.by_user(queries.PROFILE_GET, user_id, email)
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT name, age, gender, skin_tone, weight, body_length, upper_width, lower_width, phone, username,
-                   last_recommendation, best_color, worst_color, light_tones_percent, dark_tones_percent,
-                   western_percent, eastern_percent, personalized_analysis
-            FROM users WHERE username=%s
-            """,
-            (email,)
-        )
+        queries.run(cur, stmt, (key,))
         user = cur.fetchone()
         cur.close()
         conn.close()
@@ -246,81 +306,94 @@ def get_profile():
             }), 200
         else:
             return jsonify({"error": "User not found"}), 404
+    except db.PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @app.route("/api/body", methods=["POST"])
 def update_body():
     data = request.get_json() or {}
-    email = data.get("email")
+    user_id, email, claims = request_user(data)
     weight = data.get("weight")
     body_length = data.get("body_length")
     upper_width = data.get("upper_width")
     lower_width = data.get("lower_width")
     if not email:
         return jsonify({"error": "Missing email"}), 400
+    stmt, key = queries.by_user(queries.BODY_UPDATE, user_id, email)
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute(
-            """
-            UPDATE users SET
-              weight=%s, body_length=%s, upper_width=%s, lower_width=%s
-            WHERE username=%s
-            """,
-            (weight, body_length, upper_width, lower_width, email)
-        )
+        queries.run(cur, stmt, (weight, body_length, upper_width, lower_width, key))
+        row = cur.fetchone()
         conn.commit()
         cur.close()
         conn.close()
-        return jsonify({"success": True}), 200
+        payload = {"success": True}
+        if claims and row:
+            payload["token"] = session_token_for(row)
+        return jsonify(payload), 200
+    except db.PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# ---------- Skin tone (camera) ----------
+@app.route("/api/skin-tone/analyze", methods=["POST"])
+def analyze_skin_tone():
+    """
+    Match a small camera frame (JSON RGBA pixels / data URL, or a multipart
+    "image" upload) to the tone names stored in users.skin_tone.
+    """
+    # imported lazily: only this route needs numpy (and Pillow for uploads)
+    import skin_tone
+
+    # the body is never buffered beyond this; browsers always send Content-Length
+    if request.content_length is None or request.content_length > skin_tone.MAX_REQUEST_BYTES:
+        return jsonify({"error": f"Request body must be at most {skin_tone.MAX_REQUEST_BYTES} bytes"}), 413
+    try:
+        upload = request.files.get("image")
+        if upload:
+            pixels = skin_tone.from_image(upload.read())
+            patch = request.form.get("patch")
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                raise ValueError("Expected a JSON object with pixels or an image")
+            pixels = skin_tone.from_payload(data)
+            patch = data.get("patch")
+        result = skin_tone.analyze(pixels, skin_tone.parse_patch(patch))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 200
+
 # ---------- Products ----------
 @app.route("/api/products", methods=["GET"])
+@http_cache.conditional("products")
 def get_all_products():
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT id, title, description, image_url, gender, category FROM products")
-    rows = cur.fetchall()
+    queries.run(cur, queries.PRODUCTS_ALL)
+    body = cur.fetchone()[0]
     cur.close()
     conn.close()
-    products = [
-        {
-            "id": r[0], "title": r[1], "description": r[2], "image_url": r[3],
-            "gender": r[4], "category": r[5]
-        }
-        for r in rows
-    ]
-    return jsonify(products)
+    return response_encoding.json_text_response(body)
 
 @app.route("/api/products/category/<category>", methods=["GET"])
+@http_cache.conditional("products")
 def get_products_by_category(category):
     gender = request.args.get("gender")
     conn = get_db_connection()
     cur = conn.cursor()
     if gender:
-        cur.execute(
-            "SELECT id, title, description, image_url, gender, category FROM products WHERE category=%s AND gender=%s",
-            (category, gender)
-        )
+        queries.run(cur, queries.PRODUCTS_BY_CATEGORY_GENDER, (category, gender))
     else:
-        cur.execute(
-            "SELECT id, title, description, image_url, gender, category FROM products WHERE category=%s",
-            (category,)
-        )
-    rows = cur.fetchall()
+        queries.run(cur, queries.PRODUCTS_BY_CATEGORY, (category,))
+    body = cur.fetchone()[0]
     cur.close()
     conn.close()
-    products = [
-        {
-            "id": r[0], "title": r[1], "description": r[2], "image_url": r[3],
-            "gender": r[4], "category": r[5]
-        }
-        for r in rows
-    ]
-    return jsonify(products)
+    return response_encoding.json_text_response(body)
 
 @app.route("/api/products", methods=["POST"])
 def add_product():
@@ -342,15 +415,13 @@ def add_product():
                     image_url = f"/uploads/{filename}"
                     conn = get_db_connection()
                     cur = conn.cursor()
-                    cur.execute(
-                        "INSERT INTO products (title, description, image_url, gender, category) VALUES (%s,%s,%s,%s,%s) RETURNING id",
-                        (title, description, image_url, gender, category)
-                    )
+                    queries.run(cur, queries.PRODUCT_INSERT, (title, description, image_url, gender, category))
                     new_id = cur.fetchone()[0]
                     conn.commit()
                     cur.close()
                     conn.close()
                     responses.append({"id": new_id, "image_url": image_url})
+            http_cache.invalidate("products")
             return jsonify(responses), 201
 
     # JSON path
@@ -363,14 +434,12 @@ def add_product():
         gender = data.get("gender")
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO products (title, description, image_url, gender, category) VALUES (%s,%s,%s,%s,%s) RETURNING id",
-            (title, description, image_url, gender, category)
-        )
+        queries.run(cur, queries.PRODUCT_INSERT, (title, description, image_url, gender, category))
         new_id = cur.fetchone()[0]
         conn.commit()
         cur.close()
         conn.close()
+        http_cache.invalidate("products")
         return jsonify({"id": new_id, "image_url": image_url}), 201
 
     return jsonify({"error": "No image or data provided"}), 400
@@ -400,80 +469,73 @@ def update_product(product_id):
         category = data.get("category")
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute(
-        "UPDATE products SET title=%s, description=%s, image_url=%s, gender=%s, category=%s WHERE id=%s",
-        (title, description, image_url, gender, category, product_id)
-    )
+    queries.run(cur, queries.PRODUCT_UPDATE, (title, description, image_url, gender, category, product_id))
     conn.commit()
     cur.close()
     conn.close()
+    http_cache.invalidate("products")
     return jsonify({"success": True})
 
 @app.route("/api/products/<int:product_id>", methods=["DELETE"])
 def delete_product(product_id):
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("DELETE FROM products WHERE id=%s", (product_id,))
+    queries.run(cur, queries.PRODUCT_DELETE, (product_id,))
     conn.commit()
     cur.close()
     conn.close()
+    http_cache.invalidate("products")
     return jsonify({"success": True})
 
 # ---------- Recommendations (Gemini) ----------
 @app.route("/api/recommendation", methods=["POST"])
+@ratelimit.limit("llm")
 def recommendation():
     data = request.get_json() or {}
-    email = data.get("email")
+    user_id, email, claims = request_user(data)
     user_query = data.get("query")
+    tier = llm.resolve_tier(data.get("tier"))
     if not email or not user_query:
         return jsonify({"error": "Missing email or query"}), 400
 
-    # fetch profile (best-effort)
+    # fetch profile (best-effort); session tokens already carry it
     profile = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT name, age, gender, skin_tone, weight, body_length, upper_width, lower_width
-            FROM users WHERE username=%s
-            """,
-            (email,)
-        )
-        profile = cur.fetchone()
-        cur.close()
-        conn.close()
-    except Exception:
-        profile = None
-
-    if profile:
-        name, age, gender, skin_tone, weight, body_length, upper_width, lower_width = profile
-        user_profile_context = (
-            f"User profile:\n"
-            f"- Name: {name}\n"
-            f"- Age: {age}\n"
-            f"- Gender: {gender}\n"
-            f"- Skin tone: {skin_tone}\n"
-            f"- Weight: {weight} kg\n"
-            f"- Body length: {body_length} in\n"
-            f"- Upper body width: {upper_width} in\n"
-            f"- Lower body width: {lower_width} in\n"
-        )
+    if claims:
+        profile = tuple(claims.get(k) for k in sessions.PROFILE_CLAIMS)
     else:
-        user_profile_context = "No user profile found."
-
-    user_context_prompt = (
-        f"{user_profile_context}\n\n"
-        f"The user asks: {user_query}\n"
-        "Give a detailed, friendly, practical fashion recommendation for a Pakistani audience using this user's info. "
-        "Suggest the best and worst colors, recommend percentage fit for lighter/darker tones and western/eastern styles, "
-        "and include a personalized analysis/tip for the user."
-    )
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            queries.run(cur, queries.PROFILE_BY_EMAIL, (email,))
+            profile = cur.fetchone()
+            cur.close()
+            conn.close()
+        except db.PoolTimeout:
+            raise
+        except Exception:
+            profile = None
+
+    user_profile_context = llm.profile_context(profile)
+
+    # conversation memory (best-effort): bounded summary + recent turns
+    history = ""
+    try:
+        if data.get("new_session"):
+            chat_memory.reset(email, user_id)
+        else:
+            history = chat_memory.history_prompt(email, user_id)
+    except db.PoolTimeout:
+        raise
+    except Exception as e:
+        print("Could not load chat history:", e)
+
+    # static instructions live in the (cached) system prompt
+    user_context_prompt = llm.build_prompt(user_profile_context, user_query, history)
 
     try:
         # Per-request generation (no shared global chat state)
-        response = model.generate_content(user_context_prompt)
-        ai_text = response.text
+        with metrics.timed("llm"):
+            ai_text, usage = llm.generate_recommendation(user_context_prompt, tier)
     except Exception as e:
         return jsonify({"error": f"AI error: {str(e)}"}), 500
 
@@ -481,66 +543,29 @@ def recommendation():
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO chatbot_logs (user_email, question, bot_response) VALUES (%s, %s, %s)",
-            (email, user_query, ai_text)
+        queries.run(
+            cur,
+            queries.CHATLOG_INSERT,
+            (email, user_id, email, user_query, ai_text, usage["tier"], usage["prompt_tokens"],
+             usage["output_tokens"], usage["cached_tokens"], usage["latency_ms"])
         )
+        log_id = cur.fetchone()[0]
         conn.commit()
         cur.close()
         conn.close()
+        chat_memory.record(email, log_id, user_query, ai_text, user_id)
     except Exception as e:
         print("Could not save chatbot log:", e)
 
-    # extract fields (best-effort)
-    def extract_ai_fields(text: str):
-        fields = {
-            "best_color": None,
-            "worst_color": None,
-            "light_tones_percent": None,
-            "dark_tones_percent": None,
-            "western_percent": None,
-            "eastern_percent": None,
-            "personalized_analysis": None
-        }
-        patterns = {
-            "best_color": r"Best color: ?([^\n]+)",
-            "worst_color": r"Worst color: ?([^\n]+)",
-            "light_tones_percent": r"Light tones: ?(\d+)",
-            "dark_tones_percent": r"Dark tones: ?(\d+)",
-            "western_percent": r"Western styles?: ?(\d+)",
-            "eastern_percent": r"Eastern styles?: ?(\d+)",
-            "personalized_analysis": r"Personalized tip: ?([^\n]+)"
-        }
-        for key, pat in patterns.items():
-            m = re.search(pat, text, re.IGNORECASE)
-            if m:
-                val = m.group(1).strip()
-                if "percent" in key and val.isdigit():
-                    val = int(val)
-                fields[key] = val
-        if not fields["personalized_analysis"]:
-            fields["personalized_analysis"] = text
-        return fields
-
-    extracted = extract_ai_fields(ai_text)
-
-    # save extracted fields (best-effort)
+    # extract fields and save them (best-effort)
+    extracted = llm.extract_fields(ai_text)
+    stmt, key = queries.by_user(queries.RECOMMENDATION_SAVE, user_id, email)
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute(
-            """
-            UPDATE users SET
-              last_recommendation=%s,
-              best_color=%s,
-              worst_color=%s,
-              light_tones_percent=%s,
-              dark_tones_percent=%s,
-              western_percent=%s,
-              eastern_percent=%s,
-              personalized_analysis=%s
-            WHERE username=%s
-            """,
+        queries.run(
+            cur,
+            stmt,
             (
                 ai_text,
                 extracted["best_color"],
@@ -550,7 +575,7 @@ def recommendation():
                 extracted["western_percent"],
                 extracted["eastern_percent"],
                 extracted["personalized_analysis"],
-                email,
+                key,
             )
         )
         conn.commit()
@@ -564,41 +589,25 @@ def recommendation():
 # ---------- Wishlist ----------
 @app.route("/api/wishlist", methods=["GET"])
 def get_wishlist():
-    email = request.args.get("email")
+    user_id, email, _ = request_user()
+    stmt, key = queries.by_user(queries.WISHLIST_GET, user_id, email)
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT p.id, p.title, p.description, p.image_url, p.gender, p.category
-        FROM wishlist w
-        JOIN products p ON w.product_id = p.id
-        WHERE w.user_email = %s
-        """,
-        (email,)
-    )
-    items = cur.fetchall()
+    queries.run(cur, stmt, (key,))
+    body = cur.fetchone()[0]
     cur.close()
     conn.close()
-    wishlist = [
-        {
-            "id": r[0], "title": r[1], "description": r[2], "image_url": r[3],
-            "gender": r[4], "category": r[5]
-        }
-        for r in items
-    ]
-    return jsonify({"wishlist": wishlist})
+    return response_encoding.json_text_response(body)
 
 @app.route("/api/wishlist", methods=["POST"])
 def add_to_wishlist():
     data = request.get_json() or {}
-    email = data.get("email")
+    user_id, email, _ = request_user(data)
     product_id = data.get("product_id")
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT 1 FROM wishlist WHERE user_email=%s AND product_id=%s", (email, product_id))
-    if not cur.fetchone():
-        cur.execute("INSERT INTO wishlist (user_email, product_id) VALUES (%s, %s)", (email, product_id))
-        conn.commit()
+    queries.run(cur, queries.WISHLIST_ADD, (email, user_id, email, product_id))
+    conn.commit()
     cur.close()
     conn.close()
     return jsonify({"status": "added"})
@@ -606,11 +615,12 @@ def add_to_wishlist():
 @app.route("/api/wishlist", methods=["DELETE"])
 def remove_from_wishlist():
     data = request.get_json() or {}
-    email = data.get("email")
+    user_id, email, _ = request_user(data)
     product_id = data.get("product_id")
+    stmt, key = queries.by_user(queries.WISHLIST_REMOVE, user_id, email)
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("DELETE FROM wishlist WHERE user_email=%s AND product_id=%s", (email, product_id))
+    queries.run(cur, stmt, (key, product_id))
     conn.commit()
     cur.close()
     conn.close()
@@ -618,6 +628,7 @@ def remove_from_wishlist():
 
 # ---------- Contact ----------
 @app.route("/api/contact", methods=["POST"])
+@ratelimit.limit("smtp")
 def contact():
     data = request.get_json() or {}
     email = (data.get("email") or "").strip()
@@ -632,10 +643,12 @@ def contact():
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("INSERT INTO contact_messages (email, message) VALUES (%s,%s);", (email, message))
+        queries.run(cur, queries.CONTACT_INSERT, (email, message))
         conn.commit()
         cur.close()
         conn.close()
+    except db.PoolTimeout:
+        raise  # before the email goes out, so a retry cannot send it twice
     except Exception as e:
         print("Contact form DB error:", e)
 
@@ -647,152 +660,60 @@ def contact():
     return jsonify(payload), 200
 
 # ---------- Admin ----------
-@app.route("/api/admin/total-users")
-def admin_total_users():
+# chart/listing bodies are rendered by Postgres (queries.ADMIN_*), same as the ASGI app
+def admin_json(stmt):
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM users")
-    count = cur.fetchone()[0]
+    queries.run(cur, stmt)
+    body = cur.fetchone()[0]
     cur.close()
     conn.close()
-    return jsonify({"total_users": count})
+    return response_encoding.json_text_response(body)
+
+@app.route("/api/admin/total-users")
+@http_cache.conditional("users", cache_control=http_cache.ADMIN_CACHE_CONTROL)
+def admin_total_users():
+    return admin_json(queries.ADMIN_TOTAL_USERS)
 
 @app.route("/api/admin/wishlist-gender")
+@http_cache.conditional("wishlist", "users", cache_control=http_cache.ADMIN_CACHE_CONTROL)
 def admin_wishlist_gender():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT u.gender, COUNT(*) FROM wishlist w
-        JOIN users u ON w.user_email = u.username
-        GROUP BY u.gender
-        """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify({row[0] if row[0] else "Unknown": row[1] for row in rows})
+    return admin_json(queries.ADMIN_WISHLIST_GENDER)
 
 @app.route("/api/admin/most-wishlisted")
+@http_cache.conditional("wishlist", "products", cache_control=http_cache.ADMIN_CACHE_CONTROL)
 def admin_most_wishlisted():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT p.title, COUNT(*) as cnt FROM wishlist w
-        JOIN products p ON w.product_id = p.id
-        GROUP BY p.title ORDER BY cnt DESC LIMIT 5
-        """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify({"labels": [r[0] for r in rows], "counts": [r[1] for r in rows]})
+    return admin_json(queries.ADMIN_MOST_WISHLISTED)
 
 @app.route("/api/admin/skin-tone")
+@http_cache.conditional("users", cache_control=http_cache.ADMIN_CACHE_CONTROL)
 def admin_skin_tone():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT skin_tone, COUNT(*) FROM users GROUP BY skin_tone")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify({"labels": [r[0] if r[0] else "Unknown" for r in rows], "counts": [r[1] for r in rows]})
+    return admin_json(queries.ADMIN_SKIN_TONE)
 
 @app.route("/api/admin/age-group")
+@http_cache.conditional("users", cache_control=http_cache.ADMIN_CACHE_CONTROL)
 def admin_age_group():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-            CASE
-                WHEN age BETWEEN 13 AND 18 THEN '13-18'
-                WHEN age BETWEEN 19 AND 25 THEN '19-25'
-                WHEN age BETWEEN 26 AND 35 THEN '26-35'
-                WHEN age BETWEEN 36 AND 50 THEN '36-50'
-                ELSE '50+'
-            END as age_group,
-            COUNT(*)
-        FROM users
-        GROUP BY age_group
-        ORDER BY age_group
-        """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify({"labels": [r[0] for r in rows], "counts": [r[1] for r in rows]})
+    return admin_json(queries.ADMIN_AGE_GROUP)
 
 @app.route("/api/admin/recent-wishlist")
+@http_cache.conditional("wishlist", "products", cache_control=http_cache.ADMIN_CACHE_CONTROL)
 def admin_recent_wishlist():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT w.user_email, p.title, w.id FROM wishlist w
-        JOIN products p ON w.product_id = p.id
-        ORDER BY w.id DESC LIMIT 10
-        """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify([{"user": r[0], "product": r[1]} for r in rows])
+    return admin_json(queries.ADMIN_RECENT_WISHLIST)
 
 @app.route("/api/admin/chatbot-logs")
+@http_cache.conditional("chatbot_logs", cache_control=http_cache.ADMIN_CACHE_CONTROL)
 def admin_chatbot_logs():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT user_email, question, bot_response, created_at
-        FROM chatbot_logs
-        ORDER BY created_at DESC
-        LIMIT 10
-        """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    logs = [
-        {
-            "user": r[0],
-            "question": r[1],
-            "bot": r[2],
-            "time": r[3].strftime("%Y-%m-%d %H:%M") if r[3] else ""
-        }
-        for r in rows
-    ]
-    return jsonify(logs)
+    return admin_json(queries.ADMIN_CHATBOT_LOGS)
 
 @app.route("/api/users", methods=["GET"])
 def admin_get_all_users():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, username, gender, age, skin_tone, created_at FROM users ORDER BY created_at DESC")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    users = [
-        {
-            "id": r[0],
-            "name": r[1] or "",
-            "email": r[2],
-            "gender": r[3] or "",
-            "age": r[4] or "",
-            "skintone": r[5] or "",
-            "joined": r[6].strftime("%Y-%m-%d %H:%M") if r[6] else ""
-        }
-        for r in rows
-    ]
-    return jsonify(users)
+    return admin_json(queries.ADMIN_USERS)
 
 @app.route("/api/users/<int:user_id>", methods=["DELETE"])
 def admin_delete_user(user_id):
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("DELETE FROM users WHERE id=%s", (user_id,))
+    queries.run(cur, queries.USER_DELETE, (user_id,))
     conn.commit()
     cur.close()
     conn.close()
@@ -800,29 +721,30 @@ def admin_delete_user(user_id):
 
 @app.route("/api/messages", methods=["GET"])
 def admin_get_messages():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT user_email, question, bot_response, created_at
-        FROM chatbot_logs
-        ORDER BY created_at DESC
-        LIMIT 100
-        """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    logs = [
-        {
-            "user": r[0],
-            "question": r[1],
-            "reply": r[2],
-            "date": r[3].strftime("%Y-%m-%d %H:%M") if r[3] else ""
-        }
-        for r in rows
-    ]
-    return jsonify(logs)
+    return admin_json(queries.ADMIN_MESSAGES)
+
+@app.route("/api/admin/export/<dataset>", methods=["GET"])
+def admin_export(dataset):
+    """
+    Streamed bulk export: /api/admin/export/{users,wishlists,chat-logs}?format=csv|jsonl&from=YYYY-MM-DD&to=YYYY-MM-DD
+    (dates filter on created_at, both ends inclusive).
+    """
+    if dataset not in exports.DATASETS:
+        return jsonify({"error": "Unknown dataset"}), 404
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in exports.FORMATS:
+        return jsonify({"error": "format must be csv or jsonl"}), 400
+    try:
+        start = exports.parse_day(request.args.get("from"))
+        end = exports.parse_day(request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD"}), 400
+
+    body = exports.stream(get_db_connection, dataset, fmt, start, end)
+    resp = Response(stream_with_context(body), content_type=exports.FORMATS[fmt])
+    resp.headers["Content-Disposition"] = f'attachment; filename="{dataset}.{fmt}"'
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
 # ----------------- Local dev entrypoint -----------------
 if __name__ == "__main__":
@@ -0,0 +1,432 @@
+"""
+ASGI deployment mode: the catalog, wishlist, recommendation, skin-tone and admin
+read routes on Starlette + asyncpg, with the same SQL (queries.py) and the same
+JSON documents as app.py (without the trailing newline Flask's jsonify adds).
+
+    uvicorn asgi_app:app --workers 2 --port 5002
+    # or under gunicorn's process management
+    gunicorn -k uvicorn.workers.UvicornWorker -w 2 asgi_app:app
+
+Each worker holds an asyncpg pool (ASGI_DB_POOL_MIN/MAX). Per-statement metrics
+are served on /metrics; with more than one worker set PROMETHEUS_MULTIPROC_DIR
+(as for gunicorn) so a scrape covers all of them. asyncpg prepares every
+statement once per pooled connection and reuses the plan from its statement cache.
+The Gemini SDK and the chat-memory store are blocking; those calls run in the
+default thread pool (ASGI_THREADS) so they never stall the event loop, and the
+in-flight caps (ASGI_RATE_LIMIT_<CLASS>_CONCURRENCY) are sized to that pool.
+Routes not listed here (auth, profile, product writes, uploads, contact, exports)
+stay on the Flask app.
+"""
+import asyncio
+import contextlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+
+import asyncpg
+import psycopg2
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+
+import db
+import http_cache
+import llm
+import metrics
+import queries
+import ratelimit
+import response_encoding
+import sessions
+from chat_memory import ChatMemory
+
+load_dotenv()
+
+POOL_MIN = int(os.getenv("ASGI_DB_POOL_MIN", "2"))
+POOL_MAX = int(os.getenv("ASGI_DB_POOL_MAX", "20"))
+STATEMENT_CACHE_SIZE = int(os.getenv("ASGI_STATEMENT_CACHE_SIZE", "256"))
+# blocking calls (Gemini, chat memory, Redis) share this many threads per worker
+THREADS = int(os.getenv("ASGI_THREADS", "32"))
+ALLOWED_ORIGINS = os.getenv("CORS_ORIGINS", "http://127.0.0.1:5500,http://localhost:5500").split(",")
+
+pool = None
+# chat memory keeps its own (blocking) psycopg2 pool; always used from a thread
+chat_memory = ChatMemory(db.ConnectionPool(
+    lambda: psycopg2.connect(**db.connect_params(), connection_factory=db.Connection)
+).getconn)
+
+# Per-worker in-flight caps. ratelimit.CONCURRENCY is sized for a threaded Flask
+# worker; here an llm request only ties up a thread from the pool above (keeping a
+# few for chat memory and Redis) and the other classes are bounded by the DB pool.
+_DEFAULT_CONCURRENCY = {"llm": max(1, THREADS - 4)}
+CONCURRENCY = {
+    name: int(os.getenv(
+        f"ASGI_RATE_LIMIT_{name.upper()}_CONCURRENCY", str(_DEFAULT_CONCURRENCY.get(name, POOL_MAX))
+    ))
+    for name in ratelimit.COST_CLASSES
+}
+_in_flight = dict.fromkeys(CONCURRENCY, 0)
+
+@lru_cache(maxsize=None)
+def pg(sql: str) -> str:
+    return queries.numbered(sql)
+
+async def query(method, stmt, *args):
+    """
+    Run a registered statement (queries.py) through the pool with the given asyncpg
+    method; asyncpg prepares it once per connection and reuses it from its cache.
+    """
+    started = time.perf_counter()
+    result = await getattr(pool, method)(pg(stmt), *args)
+    if method == "execute":
+        # command status, e.g. "INSERT 0 1" / "DELETE 3"
+        tail = result.rsplit(" ", 1)[-1]
+        rows = int(tail) if tail.isdigit() else 0
+    elif method == "fetch":
+        rows = len(result)
+    else:
+        rows = 0 if result is None else 1
+    metrics.observe_statement(stmt.name, time.perf_counter() - started, rows)
+    return result
+
+# ----------------- Responses -----------------
+def json_text(body, status=200):
+    """Pass a JSON document rendered by Postgres straight through."""
+    return Response(body, status_code=status, media_type="application/json")
+
+def json_response(obj, status=200):
+    # sorted, compact keys like Flask's jsonify. Flask's provider also appends a
+    # trailing newline and this does not, so bodies match app.py up to that byte
+    # (the json_text ones, rendered by Postgres, are identical)
+    if response_encoding.orjson is not None:
+        body = response_encoding.orjson.dumps(obj, option=response_encoding.orjson.OPT_SORT_KEYS)
+    else:
+        body = json.dumps(obj, sort_keys=True, separators=(",", ":"))
+    return json_text(body, status)
+
+async def http_error(request, exc):
+    return json_response({"error": exc.detail}, exc.status_code)
+
+async def pool_exhausted(request, exc):
+    # chat memory's psycopg2 pool (see app.pool_exhausted)
+    print("Database pool exhausted:", exc)
+    response = json_response({"error": "Service is busy, please retry shortly"}, 503)
+    response.headers["Retry-After"] = str(max(1, math.ceil(ratelimit.SHED_RETRY_AFTER)))
+    return response
+
+# ----------------- Request helpers -----------------
+async def json_body(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def request_user(request, data=None):
+    """(user_id, email, claims), same rules as app.request_user."""
+    header = request.headers.get("authorization", "")
+    if header.startswith("Bearer "):
+        if not sessions.enabled():
+            raise HTTPException(401, "Session tokens are not enabled")
+        claims = sessions.verify(header[7:].strip())
+        if claims is None:
+            raise HTTPException(401, "Invalid or expired session token")
+        return claims["uid"], claims["email"], claims
+    if sessions.REQUIRED:
+        raise HTTPException(401, "Session token required")
+    source = data if data is not None else request.query_params
+    return None, source.get("email"), None
+
+def client_ip(request):
+    forwarded = request.headers.get("x-forwarded-for")
+    ratelimit.warn_if_proxied(forwarded)
+    if ratelimit.PROXY_HOPS and forwarded:
+        route = [hop.strip() for hop in forwarded.split(",")]
+        return route[max(0, len(route) - ratelimit.PROXY_HOPS)]
+    return request.client.host if request.client else "unknown"
+
+def as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(400, "product_id must be an integer")
+
+def _reject(route, status, reason, retry_after, message):
+    metrics.RATE_LIMITED.labels(route, reason).inc()
+    response = json_response({"error": message}, status)
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def rate_limited(cost_class, route):
+    """Async counterpart of ratelimit.limit (shared buckets, per-worker CONCURRENCY cap)."""
+    def decorator(endpoint):
+        @wraps(endpoint)
+        async def wrapper(request):
+            if not ratelimit.ENABLED:
+                return await endpoint(request)
+            data = await json_body(request)
+            _, _, claims = request_user(request, data)
+            user = ratelimit.user_key(claims, data)
+            ip = client_ip(request)
+            if ratelimit.REDIS_URL:
+                # the Redis store does network I/O; the memory store is a dict lookup
+                wait = await asyncio.to_thread(ratelimit.check, cost_class, ip, user)
+            else:
+                wait = ratelimit.check(cost_class, ip, user)
+            if wait > 0:
+                return _reject(route, 429, "rate", wait, "Too many requests, please slow down")
+            if _in_flight[cost_class] >= CONCURRENCY[cost_class]:
+                return _reject(route, 503, "shed", ratelimit.SHED_RETRY_AFTER, "Service is busy, please retry shortly")
+            _in_flight[cost_class] += 1
+            try:
+                return await endpoint(request)
+            finally:
+                _in_flight[cost_class] -= 1
+        return wrapper
+    return decorator
+
+# ----------------- HTTP caching -----------------
+async def table_versions(tables):
+    now = time.monotonic()
+    fresh = http_cache.cached_versions(tables, now)
+    missing = [t for t in tables if t not in fresh]
+    if missing:
+        rows = await query("fetch", queries.CACHE_VERSIONS, missing)
+        fresh.update(http_cache.remember_versions(missing, {r["name"]: r["version"] for r in rows}, now))
+    return [fresh[t] for t in tables]
+
+def _etag_matches(header, etag):
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == f'"{etag}"':
+            return True
+    return False
+
+def conditional(*tables, cache_control=http_cache.CATALOG_CACHE_CONTROL):
+    """Same validators as http_cache.conditional (shared per-worker version cache)."""
+    def decorator(endpoint):
+        @wraps(endpoint)
+        async def wrapper(request):
+            try:
+                etag = http_cache.etag_for(await table_versions(tables))
+            except Exception as e:
+                print("Cache version lookup failed:", e)
+                return await endpoint(request)
+            if _etag_matches(request.headers.get("if-none-match", ""), etag):
+                response = Response(status_code=304)
+            else:
+                response = await endpoint(request)
+                if response.status_code != 200:
+                    return response
+            response.headers["ETag"] = f'W/"{etag}"'
+            response.headers["Cache-Control"] = cache_control
+            if response.status_code == 304:
+                # the 200 gets its Vary from GZipMiddleware; the 304 must match it
+                response.headers["Vary"] = "Accept-Encoding"
+            return response
+        return wrapper
+    return decorator
+
+# ----------------- Routes -----------------
+async def metrics_endpoint(request):
+    # multiprocess mode reads every worker's sample files: keep it off the loop
+    body = await asyncio.to_thread(metrics.exposition)
+    return Response(body, media_type=metrics.CONTENT_TYPE_LATEST)
+
+async def hello(request):
+    return json_response({"message": "Hello from Flask backend!"})
+
+@conditional("products")
+async def get_all_products(request):
+    return json_text(await query("fetchval", queries.PRODUCTS_ALL))
+
+@conditional("products")
+async def get_products_by_category(request):
+    category = request.path_params["category"]
+    gender = request.query_params.get("gender")
+    if gender:
+        body = await query("fetchval", queries.PRODUCTS_BY_CATEGORY_GENDER, category, gender)
+    else:
+        body = await query("fetchval", queries.PRODUCTS_BY_CATEGORY, category)
+    return json_text(body)
+
+# ---------- Skin tone (camera) ----------
+async def analyze_skin_tone(request):
+    # JSON bodies only (RGBA pixels or a data URL); a frame is at most
+    # MAX_SIDE² pixels, so the numpy work stays well under a millisecond
+    import skin_tone  # lazily, as in app.py: only this route needs numpy
+
+    length = request.headers.get("content-length", "")
+    if not length.isdigit() or int(length) > skin_tone.MAX_REQUEST_BYTES:
+        raise HTTPException(413, f"Request body must be at most {skin_tone.MAX_REQUEST_BYTES} bytes")
+    data = await json_body(request)
+    try:
+        pixels = skin_tone.from_payload(data)
+        result = skin_tone.analyze(pixels, skin_tone.parse_patch(data.get("patch")))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return json_response(result)
+
+# ---------- Recommendations ----------
+def _history(email, user_id, new_session):
+    if new_session:
+        chat_memory.reset(email, user_id)
+        return ""
+    return chat_memory.history_prompt(email, user_id)
+
+@rate_limited("llm", "/api/recommendation")
+async def recommendation(request):
+    data = await json_body(request)
+    user_id, email, claims = request_user(request, data)
+    user_query = data.get("query")
+    tier = llm.resolve_tier(data.get("tier"))
+    if not email or not user_query:
+        return json_response({"error": "Missing email or query"}, 400)
+
+    profile = None
+    if claims:
+        profile = tuple(claims.get(k) for k in sessions.PROFILE_CLAIMS)
+    else:
+        try:
+            profile = await query("fetchrow", queries.PROFILE_BY_EMAIL, email)
+        except Exception:
+            profile = None
+
+    history = ""
+    try:
+        history = await asyncio.to_thread(_history, email, user_id, data.get("new_session"))
+    except db.PoolTimeout:
+        raise
+    except Exception as e:
+        print("Could not load chat history:", e)
+
+    prompt = llm.build_prompt(llm.profile_context(profile), user_query, history)
+    try:
+        ai_text, usage = await asyncio.to_thread(llm.generate_recommendation, prompt, tier)
+    except Exception as e:
+        return json_response({"error": f"AI error: {str(e)}"}, 500)
+
+    try:
+        log_id = await query(
+            "fetchval", queries.CHATLOG_INSERT,
+            email, user_id, email, user_query, ai_text, usage["tier"], usage["prompt_tokens"],
+            usage["output_tokens"], usage["cached_tokens"], usage["latency_ms"],
+        )
+        # may summarize older turns with the model: keep it off the event loop
+        await asyncio.to_thread(chat_memory.record, email, log_id, user_query, ai_text, user_id)
+    except Exception as e:
+        print("Could not save chatbot log:", e)
+
+    extracted = llm.extract_fields(ai_text)
+    stmt, key = queries.by_user(queries.RECOMMENDATION_SAVE, user_id, email)
+    try:
+        await query(
+            "execute", stmt,
+            ai_text,
+            extracted["best_color"],
+            extracted["worst_color"],
+            extracted["light_tones_percent"],
+            extracted["dark_tones_percent"],
+            extracted["western_percent"],
+            extracted["eastern_percent"],
+            extracted["personalized_analysis"],
+            key,
+        )
+    except Exception as e:
+        print("Could not save recommendation details:", e)
+
+    return json_response({"recommendation": ai_text})
+
+# ---------- Wishlist ----------
+async def get_wishlist(request):
+    user_id, email, _ = request_user(request)
+    stmt, key = queries.by_user(queries.WISHLIST_GET, user_id, email)
+    return json_text(await query("fetchval", stmt, key))
+
+async def add_to_wishlist(request):
+    data = await json_body(request)
+    user_id, email, _ = request_user(request, data)
+    product_id = as_int(data.get("product_id"))
+    await query("execute", queries.WISHLIST_ADD, email, user_id, email, product_id)
+    return json_response({"status": "added"})
+
+async def remove_from_wishlist(request):
+    data = await json_body(request)
+    user_id, email, _ = request_user(request, data)
+    product_id = as_int(data.get("product_id"))
+    stmt, key = queries.by_user(queries.WISHLIST_REMOVE, user_id, email)
+    await query("execute", stmt, key, product_id)
+    return json_response({"status": "removed"})
+
+# ---------- Admin ----------
+def admin_route(path, stmt, *tables):
+    async def endpoint(request):
+        return json_text(await query("fetchval", stmt))
+    if tables:
+        endpoint = conditional(*tables, cache_control=http_cache.ADMIN_CACHE_CONTROL)(endpoint)
+    return Route(path, endpoint, methods=["GET"])
+
+routes = [
+    Route("/metrics", metrics_endpoint, methods=["GET"]),
+    Route("/api/hello", hello),
+    Route("/api/products", get_all_products, methods=["GET"]),
+    Route("/api/products/category/{category}", get_products_by_category, methods=["GET"]),
+    Route("/api/skin-tone/analyze", analyze_skin_tone, methods=["POST"]),
+    Route("/api/recommendation", recommendation, methods=["POST"]),
+    Route("/api/wishlist", get_wishlist, methods=["GET"]),
+    Route("/api/wishlist", add_to_wishlist, methods=["POST"]),
+    Route("/api/wishlist", remove_from_wishlist, methods=["DELETE"]),
+    admin_route("/api/admin/total-users", queries.ADMIN_TOTAL_USERS, "users"),
+    admin_route("/api/admin/wishlist-gender", queries.ADMIN_WISHLIST_GENDER, "wishlist", "users"),
+    admin_route("/api/admin/most-wishlisted", queries.ADMIN_MOST_WISHLISTED, "wishlist", "products"),
+    admin_route("/api/admin/skin-tone", queries.ADMIN_SKIN_TONE, "users"),
+    admin_route("/api/admin/age-group", queries.ADMIN_AGE_GROUP, "users"),
+    admin_route("/api/admin/recent-wishlist", queries.ADMIN_RECENT_WISHLIST, "wishlist", "products"),
+    admin_route("/api/admin/chatbot-logs", queries.ADMIN_CHATBOT_LOGS, "chatbot_logs"),
+    admin_route("/api/users", queries.ADMIN_USERS),
+    admin_route("/api/messages", queries.ADMIN_MESSAGES),
+]
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global pool
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(THREADS, thread_name_prefix="asgi-blocking")
+    )
+    pool = await asyncpg.create_pool(
+        **db.asyncpg_params(),
+        min_size=POOL_MIN,
+        max_size=POOL_MAX,
+        statement_cache_size=STATEMENT_CACHE_SIZE,
+    )
+    try:
+        yield
+    finally:
+        await pool.close()
+
+app = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    exception_handlers={HTTPException: http_error, db.PoolTimeout: pool_exhausted},
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=[o.strip() for o in ALLOWED_ORIGINS],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        ),
+        Middleware(
+            GZipMiddleware,
+            minimum_size=response_encoding.COMPRESS_MIN_BYTES,
+            compresslevel=response_encoding.GZIP_LEVEL,
+        ),
+    ],
+)
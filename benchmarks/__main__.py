@@ -0,0 +1,157 @@
+"""
+Micro- and macro-benchmarks for every API route, with baseline comparison.
+
+Seed first (python -m benchmarks.seed --reset), then:
+
+    # in-process: Flask test client, one request at a time (handler + DB + serialization)
+    python -m benchmarks --mode micro --iterations 200
+
+    # over HTTP against a running server (LLM_BACKEND=fake for the chat route,
+    # RATE_LIMIT_ENABLED=0 since all traffic comes from one client)
+    python -m benchmarks --mode macro --base-url http://127.0.0.1:5001 --concurrency 16 --duration 10
+
+Results are written as JSON (--out). --save-baseline stores them as the
+baseline; later runs are compared against it and exit non-zero when a
+route's p50/p95 regresses by more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.routes import RouteScenario, build_routes
+from loadtest.driver import percentile, run
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+MIN_DELTA_MS = 1.0
+
+def _summarize(latencies, errors, elapsed):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def run_micro(routes, iterations, warmup, seed, only=None):
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    # every micro request comes from one client; don't benchmark the 429 path
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    from app import app
+
+    client = app.test_client()
+    results = {}
+    for route in routes:
+        if only and route.name not in only:
+            continue
+        rng = random.Random(seed)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for i in range(warmup + iterations):
+            path, body = route.request(rng, i)
+            t0 = time.perf_counter()
+            resp = client.open(path, method=route.method, json=body)
+            resp.get_data()
+            elapsed = time.perf_counter() - t0
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            if resp.status_code >= 500:
+                errors += 1
+        results[route.name] = _summarize(latencies, errors, time.perf_counter() - started)
+        print(f"micro {route.name:<24} p50 {results[route.name]['p50_ms']:>9}ms  "
+              f"p95 {results[route.name]['p95_ms']:>9}ms")
+    return results
+
+def run_macro(routes, base_url, concurrency, duration, seed, only=None):
+    results = {}
+    for route in routes:
+        if only and route.name not in only:
+            continue
+        summary = asyncio.run(run(base_url, RouteScenario(route, seed), concurrency, duration))
+        endpoint = summary["endpoints"].get(route.name, {})
+        results[route.name] = {k: endpoint.get(k) for k in ("requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms")}
+        print(f"macro {route.name:<24} {endpoint.get('rps', 0):>9} req/s  "
+              f"p50 {endpoint.get('p50_ms')}ms  p95 {endpoint.get('p95_ms')}ms")
+    return results
+
+def compare(current, baseline, threshold):
+    """Return a list of human-readable regressions (p50/p95 slower than baseline by > threshold)."""
+    regressions = []
+    for mode in ("micro", "macro"):
+        for name, now in (current.get(mode) or {}).items():
+            before = (baseline.get(mode) or {}).get(name)
+            if not before:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                old, new = before.get(metric), now.get(metric)
+                if not old or new is None:
+                    continue
+                if new - old > MIN_DELTA_MS and new > old * (1 + threshold):
+                    regressions.append(f"{mode} {name} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PaletteFit API benchmarks")
+    parser.add_argument("--mode", choices=["micro", "macro", "both"], default="micro")
+    parser.add_argument("--routes", help="comma-separated route names (default: all)")
+    parser.add_argument("--users", type=int, default=100_000, help="seeded user count")
+    parser.add_argument("--products", type=int, default=100_000, help="seeded product count")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--base-url", default="http://127.0.0.1:5001")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    only = set(args.routes.split(",")) if args.routes else None
+    routes = build_routes(args.users, args.products, uuid.uuid4().hex[:8])
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "mode": args.mode,
+            "users": args.users,
+            "products": args.products,
+        }
+    }
+    if args.mode in ("micro", "both"):
+        result["micro"] = run_micro(routes, args.iterations, args.warmup, args.seed, only)
+    if args.mode in ("macro", "both"):
+        result["macro"] = run_macro(routes, args.base_url, args.concurrency, args.duration, args.seed, only)
+
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(result, json.load(f), args.threshold)
+    for line in regressions:
+        print("REGRESSION", line)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
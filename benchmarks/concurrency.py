@@ -0,0 +1,74 @@
+"""
+Concurrent-connection scaling: the same load-test scenario against the sync
+(gunicorn + Flask) and async (uvicorn + asgi_app) deployments, at increasing
+numbers of concurrent clients.
+
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=lognormal:800:0.5 RATE_LIMIT_ENABLED=0 \
+        gunicorn -w 2 --threads 4 -b 127.0.0.1:5001 app:app
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=lognormal:800:0.5 RATE_LIMIT_ENABLED=0 \
+        uvicorn asgi_app:app --workers 2 --port 5002
+
+    python -m benchmarks.concurrency --scenario mixed --levels 1,8,32,128,512 \
+        --target sync=http://127.0.0.1:5001 --target async=http://127.0.0.1:5002
+
+Both servers must point at the same seeded database (python -m benchmarks.seed).
+Per level it reports throughput, p50/p95 and error counts; the sync deployment
+flattens out near workers x threads while the async one keeps scaling until
+Postgres (ASGI_DB_POOL_MAX) or the model becomes the bottleneck.
+"""
+import argparse
+import asyncio
+import json
+
+from loadtest.__main__ import fetch_product_ids
+from loadtest.driver import run
+from loadtest.scenarios import SCENARIOS
+
+def _overall(summary):
+    endpoints = summary["endpoints"].values()
+    errors = sum(e["errors"] for e in endpoints)
+    # request-weighted view across endpoints; per-endpoint detail stays in the JSON
+    worst_p95 = max((e["p95_ms"] for e in endpoints), default=0.0)
+    weighted_p50 = sum(e["p50_ms"] * e["requests"] for e in endpoints) / max(summary["requests"], 1)
+    return {
+        "throughput_rps": summary["throughput_rps"],
+        "p50_ms": round(weighted_p50, 1),
+        "p95_ms": worst_p95,
+        "errors": errors,
+        "mean_in_flight": summary["mean_in_flight"],
+    }
+
+async def main(args):
+    targets = dict(t.split("=", 1) for t in args.target)
+    levels = [int(level) for level in args.levels.split(",")]
+    product_ids = await fetch_product_ids(next(iter(targets.values())))
+
+    results = {name: {} for name in targets}
+    print(f"{'clients':>8}  " + "  ".join(f"{name + ' rps':>12}{'p50':>9}{'p95':>9}{'errs':>6}" for name in targets))
+    for level in levels:
+        cells = []
+        for name, base_url in targets.items():
+            scenario = SCENARIOS[args.scenario](args.users, product_ids, seed=args.seed)
+            summary = await run(base_url, scenario, level, args.duration)
+            results[name][level] = {**_overall(summary), "endpoints": summary["endpoints"]}
+            r = results[name][level]
+            cells.append(f"{r['throughput_rps']:>12}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['errors']:>6}")
+            await asyncio.sleep(args.cooldown)
+        print(f"{level:>8}  " + "  ".join(cells))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"scenario": args.scenario, "duration": args.duration, "results": results}, f, indent=2)
+        print(f"results written to {args.json}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sync vs async concurrency scaling")
+    parser.add_argument("--target", action="append", required=True, help="name=base_url, repeatable")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--levels", default="1,8,32,128,512", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per level and target")
+    parser.add_argument("--cooldown", type=float, default=2, help="pause between runs")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the machine-readable result to this file")
+    asyncio.run(main(parser.parse_args()))
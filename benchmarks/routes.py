@@ -0,0 +1,78 @@
+import random
+from urllib.parse import quote
+
+from benchmarks.seed import BENCH_PASSWORD, CATEGORIES, PRODUCT_GENDERS, bench_email
+
+# Routes that delete or create catalog/user rows (DELETE /api/users/<id>,
+# POST/PUT/DELETE /api/products) are left out so repeated runs keep the
+# seeded dataset stable; register uses fresh addresses each call.
+
+class Route:
+    def __init__(self, name, method, make_request):
+        self.name = name
+        self.method = method
+        self._make = make_request
+
+    def request(self, rng, i):
+        """Return (path, json_body) for iteration i."""
+        return self._make(rng, i)
+
+def _email(rng, users):
+    return bench_email(rng.randrange(users))
+
+def build_routes(users: int, products: int, run_id: str):
+    def product_id(rng):
+        return rng.randint(1, max(products, 1))
+
+    return [
+        Route("hello", "GET", lambda rng, i: ("/api/hello", None)),
+        Route("products", "GET", lambda rng, i: ("/api/products", None)),
+        Route("products:category", "GET", lambda rng, i: (
+            f"/api/products/category/{quote(rng.choice(CATEGORIES))}?gender={quote(rng.choice(PRODUCT_GENDERS))}",
+            None)),
+        Route("register", "POST", lambda rng, i: ("/api/register", {
+            "username": f"bench-{run_id}-{i}@example.com", "password": BENCH_PASSWORD})),
+        Route("login", "POST", lambda rng, i: ("/api/login", {
+            "email": _email(rng, users), "password": BENCH_PASSWORD})),
+        Route("get_profile", "POST", lambda rng, i: ("/api/get_profile", {"email": _email(rng, users)})),
+        Route("profile", "POST", lambda rng, i: ("/api/profile", {
+            "email": _email(rng, users), "name": "Bench User", "age": rng.randint(13, 70),
+            "gender": "Female", "skin_tone": "medium", "weight": 60, "body_length": 65,
+            "upper_width": 18, "lower_width": 20})),
+        Route("body", "POST", lambda rng, i: ("/api/body", {
+            "email": _email(rng, users), "weight": 60, "body_length": 65,
+            "upper_width": 18, "lower_width": 20})),
+        Route("wishlist:get", "GET", lambda rng, i: (f"/api/wishlist?email={quote(_email(rng, users))}", None)),
+        Route("wishlist:add", "POST", lambda rng, i: ("/api/wishlist", {
+            "email": _email(rng, users), "product_id": product_id(rng)})),
+        Route("wishlist:remove", "DELETE", lambda rng, i: ("/api/wishlist", {
+            "email": _email(rng, users), "product_id": product_id(rng)})),
+        Route("recommendation", "POST", lambda rng, i: ("/api/recommendation", {
+            "email": _email(rng, users), "query": "What should I wear to a wedding?", "tier": "brief"})),
+        Route("contact", "POST", lambda rng, i: ("/api/contact", {
+            "email": _email(rng, users), "message": "Benchmark message"})),
+        Route("admin:total-users", "GET", lambda rng, i: ("/api/admin/total-users", None)),
+        Route("admin:wishlist-gender", "GET", lambda rng, i: ("/api/admin/wishlist-gender", None)),
+        Route("admin:most-wishlisted", "GET", lambda rng, i: ("/api/admin/most-wishlisted", None)),
+        Route("admin:skin-tone", "GET", lambda rng, i: ("/api/admin/skin-tone", None)),
+        Route("admin:age-group", "GET", lambda rng, i: ("/api/admin/age-group", None)),
+        Route("admin:recent-wishlist", "GET", lambda rng, i: ("/api/admin/recent-wishlist", None)),
+        Route("admin:chatbot-logs", "GET", lambda rng, i: ("/api/admin/chatbot-logs", None)),
+        Route("users", "GET", lambda rng, i: ("/api/users", None)),
+        Route("messages", "GET", lambda rng, i: ("/api/messages", None)),
+    ]
+
+class RouteScenario:
+    """Adapts a single Route to the loadtest driver's scenario interface."""
+
+    def __init__(self, route, seed=42):
+        self.route = route
+        self.seed = seed
+
+    def new_user(self, index):
+        return {"rng": random.Random(self.seed + index), "i": index * 1_000_000}
+
+    def next_request(self, state):
+        state["i"] += 1
+        path, body = self.route.request(state["rng"], state["i"])
+        return self.route.name, self.route.method, path, body
@@ -0,0 +1,177 @@
+"""
+Load a synthetic dataset into the database configured for app.py (DATABASE_URL / DB_*) via COPY.
+
+    python -m benchmarks.seed --reset --users 100000 --products 100000 \
+        --wishlist 2000000 --chat-logs 1000000
+
+Rows are generated lazily and streamed, so memory stays flat regardless of size.
+Chat logs span the last CHAT_LOG_DAYS; their monthly chatbot_logs partitions are
+created before the COPY so no row lands in chatbot_logs_default.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+BENCH_PASSWORD = "benchmark-password"
+GENDERS = ["Male", "Female"]
+PRODUCT_GENDERS = ["Men Wear", "Women Wear"]
+CATEGORIES = ["Summer", "Winter", "Wedding", "Vacation"]
+SKIN_TONES = ["fair", "light", "medium", "olive", "tan", "brown", "dark"]
+COLORS = ["Emerald", "Maroon", "Navy", "Mustard", "Ivory", "Teal", "Blush", "Charcoal"]
+GARMENTS = ["Kurta", "Shalwar Kameez", "Sherwani", "Lehenga", "Saree", "Kaftan", "Maxi", "Blazer", "Polo", "Sandals"]
+CHAT_LOG_DAYS = 365
+
+def bench_email(i: int) -> str:
+    return f"bench{i}@example.com"
+
+def _escape(value) -> str:
+    if value is None:
+        return r"\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+class RowStream(io.TextIOBase):
+    """File-like object that renders rows to COPY text format on demand."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buf = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+            self._buf += "\t".join(_escape(v) for v in row) + "\n"
+        if size < 0:
+            out, self._buf = self._buf, ""
+        else:
+            out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+def user_rows(n, rng, password_hash, now):
+    for i in range(n):
+        yield (
+            bench_email(i), password_hash, f"03{rng.randint(100000000, 999999999)}",
+            f"Bench User {i}", rng.randint(13, 70), rng.choice(GENDERS), rng.choice(SKIN_TONES),
+            rng.randint(40, 110), rng.randint(55, 75), rng.randint(14, 24), rng.randint(14, 26),
+            now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+        )
+
+def product_rows(n, rng):
+    for i in range(n):
+        color, garment = rng.choice(COLORS), rng.choice(GARMENTS)
+        category, gender = rng.choice(CATEGORIES), rng.choice(PRODUCT_GENDERS)
+        yield (
+            f"{color} {garment} {i}",
+            f"{color} {garment}: a trendy {category.lower()} pick for {gender.lower()}, perfect for every wardrobe!",
+            f"/uploads/{garment.replace(' ', '_')}.jpg", gender, category,
+        )
+
+def wishlist_rows(n, users, products, rng):
+    per_user = max(n // users, 1)
+    emitted = 0
+    for i in range(users):
+        for product_id in rng.sample(range(1, products + 1), min(per_user, products)):
+            if emitted >= n:
+                return
+            emitted += 1
+            yield bench_email(i), i + 1, product_id
+
+def chat_rows(n, users, rng, now):
+    for _ in range(n):
+        user = rng.randrange(users)
+        best, worst = rng.sample(COLORS, 2)
+        light, western = rng.randint(20, 80), rng.randint(20, 80)
+        response = (
+            f"Best color: {best}\nWorst color: {worst}\nLight tones: {light}\nDark tones: {100 - light}\n"
+            f"Western styles: {western}\nEastern styles: {100 - western}\n"
+            f"Personalized tip: Pair {best.lower()} with neutral accessories. "
+        ) * rng.randint(2, 8)
+        prompt_tokens, output_tokens = rng.randint(150, 900), len(response) // 4
+        yield (
+            bench_email(user), user + 1,
+            f"What should I wear to a {rng.choice(CATEGORIES).lower()} event?",
+            response, "standard", prompt_tokens, output_tokens, 0, rng.randint(400, 4000),
+            now - timedelta(seconds=rng.randint(0, CHAT_LOG_DAYS * 86400)),
+        )
+
+def ensure_chat_partitions(conn, now):
+    """One chatbot_logs partition per month the generated chat_rows can fall in."""
+    from chatlog_retention import month_start
+
+    first, last = month_start((now - timedelta(days=CHAT_LOG_DAYS)).date()), month_start(now.date())
+    offset = 0
+    with conn.cursor() as cur:
+        while month_start(first, offset) <= last:
+            cur.execute("SELECT ensure_chatbot_logs_partition(%s)", (month_start(first, offset),))
+            offset += 1
+    conn.commit()
+    print(f"{'partitions':<12} {offset} months ready")
+
+def copy_rows(conn, table, columns, rows, label):
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", RowStream(rows), size=1 << 16)
+    conn.commit()
+    print(f"{label:<12} loaded in {time.perf_counter() - started:.1f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed synthetic benchmark data")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--wishlist", type=int, default=2_000_000)
+    parser.add_argument("--chat-logs", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--reset", action="store_true", help="truncate the app tables first")
+    args = parser.parse_args(argv)
+
+    # the seeder never calls the model; don't require a Gemini key to import app
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    from app import get_db_connection
+
+    rng = random.Random(args.seed)
+    now = datetime.now()
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        if args.reset:
+            cur.execute(
+                "TRUNCATE wishlist, chatbot_logs, chat_sessions, contact_messages, products, users RESTART IDENTITY CASCADE"
+            )
+            conn.commit()
+        else:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM users) OR EXISTS (SELECT 1 FROM products)")
+            if cur.fetchone()[0]:
+                sys.exit("Tables are not empty; pass --reset to truncate them first.")
+
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    copy_rows(conn, "users",
+              ["username", "password", "phone", "name", "age", "gender", "skin_tone",
+               "weight", "body_length", "upper_width", "lower_width", "created_at"],
+              user_rows(args.users, rng, password_hash, now), "users")
+    copy_rows(conn, "products", ["title", "description", "image_url", "gender", "category"],
+              product_rows(args.products, rng), "products")
+    copy_rows(conn, "wishlist", ["user_email", "user_id", "product_id"],
+              wishlist_rows(args.wishlist, args.users, args.products, rng), "wishlist")
+    ensure_chat_partitions(conn, now)
+    copy_rows(conn, "chatbot_logs",
+              ["user_email", "user_id", "question", "bot_response", "tier", "prompt_tokens",
+               "output_tokens", "cached_tokens", "latency_ms", "created_at"],
+              chat_rows(args.chat_logs, args.users, rng, now), "chatbot_logs")
+
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Serialization/compression cost of large catalog-style payloads.
+
+    python -m benchmarks.serialization --rows 100000
+
+Compares Flask's stdlib JSON provider with response_encoding.FastJSONProvider and
+reports gzip/brotli sizes and times for the resulting body.
+"""
+import argparse
+import gzip
+import random
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import response_encoding
+from benchmarks.seed import product_rows
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON serialization and compression benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rows = [
+        {"id": i + 1, "title": t, "description": d, "image_url": u, "gender": g, "category": c}
+        for i, (t, d, u, g, c) in enumerate(product_rows(args.rows, random.Random(1)))
+    ]
+    app = Flask(__name__)
+    providers = {"flask-stdlib": DefaultJSONProvider(app), "fast": response_encoding.FastJSONProvider(app)}
+    with app.app_context():
+        for name, provider in providers.items():
+            seconds, resp = _best_of(lambda: provider.response(rows), args.repeat)
+            print(f"{name:<14} {args.rows} rows  {seconds * 1000:8.1f} ms  {len(resp.get_data()) / 1e6:6.2f} MB")
+
+        body = providers["fast"].response(rows).get_data()
+        seconds, out = _best_of(lambda: gzip.compress(body, response_encoding.GZIP_LEVEL, mtime=0), args.repeat)
+        print(f"gzip-{response_encoding.GZIP_LEVEL:<9} {seconds * 1000:8.1f} ms  {len(out) / 1e6:6.2f} MB")
+        if response_encoding.brotli is not None:
+            seconds, out = _best_of(lambda: response_encoding.brotli.compress(body, quality=response_encoding.BROTLI_QUALITY), args.repeat)
+            print(f"brotli-{response_encoding.BROTLI_QUALITY:<7} {seconds * 1000:8.1f} ms  {len(out) / 1e6:6.2f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Worker startup cost: wall time and RSS of a fresh interpreter importing app.py.
+
+    python -m benchmarks.startup --runs 10 --out startup.json
+    python -m benchmarks.startup --importtime      # top modules by cumulative import time
+
+Each run happens in a new subprocess, which is what a gunicorn worker without
+--preload pays on boot. --baseline compares against a previous --out file.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+import app
+elapsed = time.perf_counter() - t0
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "rss_mb": rss_kb / 1024,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "genai_loaded": "google.generativeai" in sys.modules,
+    "numpy_loaded": "numpy" in sys.modules,
+}))
+"""
+
+def measure(runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    import_ms = sorted(s["import_ms"] for s in samples)
+    rss = sorted(s["rss_mb"] for s in samples)
+    return {
+        "runs": runs,
+        "import_ms_p50": round(statistics.median(import_ms), 1),
+        "import_ms_max": round(import_ms[-1], 1),
+        "rss_mb_p50": round(statistics.median(rss), 1),
+        "modules": samples[-1]["modules"],
+        "genai_loaded_at_import": samples[-1]["genai_loaded"],
+        "numpy_loaded_at_import": samples[-1]["numpy_loaded"],
+    }
+
+def importtime(top):
+    """Run `python -X importtime -c 'import app'` and return the slowest modules (cumulative us)."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|\s+(.*)", line)
+        if m:
+            rows.append((int(m.group(2)), m.group(3).strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app.py import time and RSS per worker")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    if args.importtime:
+        result["slowest_imports"] = importtime(args.top)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            base = json.load(f)
+        failed = False
+        for key in ("import_ms_p50", "rss_mb_p50"):
+            if base.get(key) and result[key] > base[key] * (1 + args.threshold):
+                print(f"REGRESSION {key}: {base[key]} -> {result[key]}")
+                failed = True
+        return 1 if failed else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import llm
+import queries
+
+# ----------------- Budgets -----------------
+# Rough chars-per-token ratio; good enough for budgeting without a tokenizer call
+CHARS_PER_TOKEN = 4
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKENS", "1200"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+MAX_RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", "6"))
+KEEP_AFTER_COMPACT = max(MAX_RECENT_TURNS // 2, 1)
+TURN_REPLY_CHARS = int(os.getenv("CHAT_TURN_REPLY_CHARS", "600"))
+
+# Per-process LRU. A user's turns can land on any worker, so history_prompt checks
+# the newest chatbot_logs id (index-only) before trusting a cached session; the
+# TTL only bounds how long an idle session is kept.
+CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "1024"))
+CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", "300"))
+
+# Summarizing is a second model call; it runs off the request path on this many threads
+COMPACT_WORKERS = int(os.getenv("CHAT_COMPACT_WORKERS", "2"))
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+def _clip(text: str, limit: int) -> str:
+    text = (text or "").strip()
+    return text if len(text) <= limit else text[:limit].rstrip() + " ..."
+
+class ChatMemory:
+    """
+    Per-user stylist sessions on top of chatbot_logs: a compacted summary
+    (chat_sessions) plus the turns logged after it, bounded by a token budget.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # created on first use, so a preloaded app forks before any thread exists
+        self._executor = None
+        self._compacting = set()
+
+    # ---------- cache ----------
+    def _cache_get(self, email):
+        with self._lock:
+            session = self._cache.get(email)
+            if session is None:
+                return None
+            if time.time() - session["loaded_at"] > CACHE_TTL:
+                del self._cache[email]
+                return None
+            self._cache.move_to_end(email)
+            return session
+
+    def _cache_put(self, email, session):
+        with self._lock:
+            self._cache[email] = session
+            self._cache.move_to_end(email)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    # ---------- storage ----------
+    def _last_log_id(self, cur, email, user_id):
+        stmt, key = queries.by_user(queries.CHAT_LAST_LOG_ID, user_id, email)
+        queries.run(cur, stmt, (key,))
+        return cur.fetchone()[0]
+
+    def load(self, email, user_id=None, validate=False):
+        """
+        The cached session; chatbot_logs is read by user_id when the caller has one.
+        With validate, a cached session is reloaded when another worker logged a
+        turn it has not seen.
+        """
+        session = self._cache_get(email)
+        if session is not None and not validate:
+            return session
+
+        conn = self._connect()
+        cur = conn.cursor()
+        if session is not None:
+            with self._lock:
+                seen = max([session["through_id"]] + [t[0] for t in session["turns"]])
+            if self._last_log_id(cur, email, user_id) <= seen:
+                cur.close()
+                conn.close()
+                return session
+        queries.run(cur, queries.CHAT_SESSION_GET, (email,))
+        row = cur.fetchone()
+        summary, through_id = (row[0] or "", row[1] or 0) if row else ("", 0)
+        stmt, key = queries.by_user(queries.CHAT_RECENT_TURNS, user_id, email)
+        queries.run(cur, stmt, (key, through_id, MAX_RECENT_TURNS))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+
+        session = {
+            "summary": summary,
+            "through_id": through_id,
+            "turns": [(r[0], r[1] or "", _clip(r[2], TURN_REPLY_CHARS)) for r in reversed(rows)],
+            "loaded_at": time.time(),
+        }
+        self._cache_put(email, session)
+        return session
+
+    def _save_summary(self, email, summary, through_id):
+        conn = self._connect()
+        cur = conn.cursor()
+        queries.run(cur, queries.CHAT_SESSION_SAVE, (email, summary, through_id))
+        conn.commit()
+        cur.close()
+        conn.close()
+
+    # ---------- public API ----------
+    def history_prompt(self, email, user_id=None) -> str:
+        """Summary + as many recent turns (newest first) as fit in the history budget."""
+        session = self.load(email, user_id, validate=True)
+        budget = HISTORY_TOKEN_BUDGET
+        lines = []
+        if session["summary"]:
+            summary = f"Earlier conversation summary: {session['summary']}"
+            budget -= estimate_tokens(summary)
+        else:
+            summary = ""
+        for _, question, answer in reversed(session["turns"]):
+            turn = f"User: {question}\nStylist: {answer}"
+            cost = estimate_tokens(turn)
+            if cost > budget:
+                break
+            budget -= cost
+            lines.append(turn)
+        lines.reverse()
+        if summary:
+            lines.insert(0, summary)
+        return "\n".join(lines)
+
+    def record(self, email, log_id, question, answer, user_id=None):
+        """
+        Append a turn to the cached session. When it outgrows the window, the older
+        turns are folded into the summary in the background.
+        """
+        session = self.load(email, user_id)
+        with self._lock:
+            # a cold load() already read the just-inserted chatbot_logs row
+            if all(turn[0] != log_id for turn in session["turns"]):
+                session["turns"].append((log_id, question or "", _clip(answer, TURN_REPLY_CHARS)))
+            turns_tokens = sum(estimate_tokens(q) + estimate_tokens(a) for _, q, a in session["turns"])
+            overflow = len(session["turns"]) > MAX_RECENT_TURNS or turns_tokens > HISTORY_TOKEN_BUDGET
+            if not overflow:
+                return
+            fold = session["turns"][:-KEEP_AFTER_COMPACT]
+            previous_summary = session["summary"]
+            if not fold or email in self._compacting:
+                # one compaction per user at a time; a later turn retries
+                return
+            self._compacting.add(email)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(COMPACT_WORKERS, thread_name_prefix="chat-compact")
+            executor = self._executor
+        executor.submit(self._compact, email, session, previous_summary, fold)
+
+    def _compact(self, email, session, previous_summary, fold):
+        try:
+            self._summarize(email, session, previous_summary, fold)
+        except Exception as e:
+            print("Chat history compaction failed:", e)
+        finally:
+            with self._lock:
+                self._compacting.discard(email)
+
+    def _summarize(self, email, session, previous_summary, fold):
+        try:
+            summary = llm.summarize_history(
+                previous_summary, [(q, a) for _, q, a in fold], SUMMARY_TOKEN_BUDGET
+            )
+        except Exception as e:
+            # keep the old summary; the folded turns simply age out of the window
+            print("Could not summarize chat history:", e)
+            summary = previous_summary
+        summary = _clip(summary, SUMMARY_TOKEN_BUDGET * CHARS_PER_TOKEN)
+        through_id = fold[-1][0]
+        with self._lock:
+            if self._cache.get(email) is not session:
+                # reset() (or eviction) replaced the session while we were summarizing
+                return
+            session["summary"] = summary
+            session["through_id"] = through_id
+            session["turns"] = [t for t in session["turns"] if t[0] > through_id]
+        self._save_summary(email, summary, through_id)
+
+    def reset(self, email, user_id=None):
+        """Start a fresh session: everything logged so far is treated as summarized away."""
+        conn = self._connect()
+        cur = conn.cursor()
+        through_id = self._last_log_id(cur, email, user_id)
+        cur.close()
+        conn.close()
+        self._save_summary(email, "", through_id)
+        with self._lock:
+            self._cache.pop(email, None)
@@ -0,0 +1,199 @@
+"""
+Partition maintenance and archival for chatbot_logs / contact_messages.
+
+    # create this month's and the next N months' partitions (run daily from cron)
+    python chatlog_retention.py partitions --ahead 2
+
+    # move whole months older than the retention window to compressed JSONL
+    python chatlog_retention.py archive --keep-months 6 --out-dir archive/
+
+Both commands first give any month left in chatbot_logs_default (a missed
+`partitions` run, bulk-loaded history) its own partition, so those rows are
+archived on schedule too.
+
+Archived chatbot_logs partitions are written as <partition>.jsonl.zst (zstandard,
+falls back to .jsonl.gz when it is not installed), the row count is checked, and
+only then is the partition detached and dropped. contact_messages is not
+partitioned; rows older than the cutoff are archived and deleted in one
+transaction.
+"""
+import argparse
+import gzip
+import os
+import sys
+from datetime import date
+
+import psycopg2
+from dotenv import load_dotenv
+
+import db
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+FETCH_SIZE = 5000
+
+def get_db_connection():
+    # a plain connection: the cron job needs none of the Flask app or its pool
+    return psycopg2.connect(**db.connect_params())
+
+def month_start(d: date, offset: int = 0) -> date:
+    index = d.year * 12 + d.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+def open_archive(path_base: str):
+    if zstandard is not None:
+        path = path_base + ".jsonl.zst"
+        raw = open(path, "wb")
+        return path, zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+    path = path_base + ".jsonl.gz"
+    return path, gzip.open(path, "wb", compresslevel=6)
+
+def dump_query(conn, sql, params, path_base):
+    """Stream row_to_json() rows from a server-side cursor into a compressed JSONL file."""
+    path, out = open_archive(path_base)
+    count = 0
+    with conn.cursor(name="archive_dump") as cur:
+        cur.itersize = FETCH_SIZE
+        cur.execute(sql, params)
+        for (row,) in cur:
+            out.write(row.encode("utf-8") + b"\n")
+            count += 1
+    out.flush()
+    out.close()
+    return path, count
+
+def drain_default(conn, dry_run: bool = False):
+    """
+    Give every month that still has rows in chatbot_logs_default its own partition
+    (ensure_chatbot_logs_partition moves them over). Rows land there when a
+    `partitions` run was missed or history was bulk-loaded; once drained, they
+    age out through the monthly archive like everything else.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT date_trunc('month', created_at)::date AS month, COUNT(*)
+            FROM chatbot_logs_default
+            GROUP BY month
+            ORDER BY month
+            """
+        )
+        for month, count in cur.fetchall():
+            if dry_run:
+                print(f"would move {count} rows for {month:%Y-%m} out of chatbot_logs_default")
+                continue
+            cur.execute("SELECT ensure_chatbot_logs_partition(%s)", (month,))
+            print(f"partition ready: {cur.fetchone()[0]} ({count} rows moved from default)")
+            conn.commit()
+    conn.commit()
+
+def ensure_partitions(ahead: int):
+    conn = get_db_connection()
+    drain_default(conn)
+    with conn.cursor() as cur:
+        today = date.today()
+        for m in range(ahead + 1):
+            cur.execute("SELECT ensure_chatbot_logs_partition(%s)", (month_start(today, m),))
+            print("partition ready:", cur.fetchone()[0])
+    conn.commit()
+    conn.close()
+
+def expired_partitions(conn, cutoff: date):
+    """Monthly partitions whose upper bound is at or before the cutoff."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'chatbot_logs'::regclass AND c.relname ~ '^chatbot_logs_[0-9]{4}_[0-9]{2}$'
+            ORDER BY c.relname
+            """
+        )
+        rows = cur.fetchall()
+    expired = []
+    for (name,) in rows:
+        year, month = int(name[-7:-3]), int(name[-2:])
+        if month_start(date(year, month, 1), 1) <= cutoff:
+            expired.append(name)
+    return expired
+
+def archive_chatbot_logs(conn, cutoff: date, out_dir: str, dry_run: bool):
+    for part in expired_partitions(conn, cutoff):
+        if dry_run:
+            print("would archive", part)
+            continue
+        path, count = dump_query(
+            conn, f'SELECT row_to_json(t)::text FROM "{part}" t ORDER BY id', None, os.path.join(out_dir, part)
+        )
+        with conn.cursor() as cur:
+            cur.execute(f'SELECT COUNT(*) FROM "{part}"')
+            expected = cur.fetchone()[0]
+            if expected != count:
+                conn.rollback()
+                sys.exit(f"{part}: wrote {count} rows but table has {expected}; leaving it attached")
+            cur.execute(f'ALTER TABLE chatbot_logs DETACH PARTITION "{part}"')
+            cur.execute(f'DROP TABLE "{part}"')
+        conn.commit()
+        print(f"archived {part}: {count} rows -> {path}")
+
+def archive_contact_messages(conn, cutoff: date, out_dir: str, dry_run: bool):
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM contact_messages WHERE created_at < %s", (cutoff,))
+        expected = cur.fetchone()[0]
+    conn.commit()
+    if expected == 0 or dry_run:
+        print(f"contact_messages: {expected} rows older than {cutoff}" + (" (dry run)" if dry_run else ""))
+        return
+    # same transaction for dump + delete, so nothing is lost between the two
+    conn.set_session(isolation_level="REPEATABLE READ")
+    path, count = dump_query(
+        conn,
+        "SELECT row_to_json(t)::text FROM contact_messages t WHERE created_at < %s ORDER BY id",
+        (cutoff,),
+        os.path.join(out_dir, f"contact_messages_before_{cutoff:%Y_%m}"),
+    )
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM contact_messages WHERE created_at < %s", (cutoff,))
+        deleted = cur.rowcount
+    if deleted != count:
+        conn.rollback()
+        sys.exit(f"contact_messages: wrote {count} rows but would delete {deleted}; rolled back")
+    conn.commit()
+    conn.set_session(isolation_level="READ COMMITTED")
+    print(f"archived contact_messages: {count} rows -> {path}")
+
+def archive(keep_months: int, contact_keep_months: int, out_dir: str, dry_run: bool):
+    os.makedirs(out_dir, exist_ok=True)
+    today = date.today()
+    conn = get_db_connection()
+    # months stuck in the default partition are not in expired_partitions() otherwise
+    drain_default(conn, dry_run)
+    archive_chatbot_logs(conn, month_start(today, -keep_months), out_dir, dry_run)
+    archive_contact_messages(conn, month_start(today, -contact_keep_months), out_dir, dry_run)
+    conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="chatbot_logs partitioning and retention")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("partitions", help="create upcoming monthly partitions")
+    p.add_argument("--ahead", type=int, default=2)
+    a = sub.add_parser("archive", help="archive and drop data older than the retention window")
+    a.add_argument("--keep-months", type=int, default=int(os.getenv("CHATLOG_RETENTION_MONTHS", "6")))
+    a.add_argument("--contact-keep-months", type=int, default=int(os.getenv("CONTACT_RETENTION_MONTHS", "12")))
+    a.add_argument("--out-dir", default=os.getenv("ARCHIVE_DIR", "archive"))
+    a.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "partitions":
+        ensure_partitions(args.ahead)
+    else:
+        archive(args.keep_months, args.contact_keep_months, args.out_dir, args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -36,17 +36,79 @@ CREATE TABLE IF NOT EXISTS products (
 CREATE TABLE IF NOT EXISTS wishlist (
   id SERIAL PRIMARY KEY,
   user_email TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+  user_id INT REFERENCES users(id) ON DELETE CASCADE,
   product_id INT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
   created_at TIMESTAMP DEFAULT NOW(),
   UNIQUE(user_email, product_id)
 );
 
+-- Partitioned by month on created_at (see chatlog_retention.py); databases with
+-- the old single heap table are converted by migrations/001_partition_chatbot_logs.sql
 CREATE TABLE IF NOT EXISTS chatbot_logs (
-  id SERIAL PRIMARY KEY,
+  id SERIAL,
   user_email TEXT,
+  user_id INT,
   question TEXT,
   bot_response TEXT,
-  created_at TIMESTAMP DEFAULT NOW()
+  tier TEXT,
+  prompt_tokens INT,
+  output_tokens INT,
+  cached_tokens INT,
+  latency_ms INT,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- catches rows for months that have no partition yet
+CREATE TABLE IF NOT EXISTS chatbot_logs_default PARTITION OF chatbot_logs DEFAULT;
+
+-- token/latency accounting for databases created before these columns existed
+ALTER TABLE chatbot_logs ADD COLUMN IF NOT EXISTS tier TEXT;
+ALTER TABLE chatbot_logs ADD COLUMN IF NOT EXISTS prompt_tokens INT;
+ALTER TABLE chatbot_logs ADD COLUMN IF NOT EXISTS output_tokens INT;
+ALTER TABLE chatbot_logs ADD COLUMN IF NOT EXISTS cached_tokens INT;
+ALTER TABLE chatbot_logs ADD COLUMN IF NOT EXISTS latency_ms INT;
+
+CREATE INDEX IF NOT EXISTS chatbot_logs_user_email_id_idx ON chatbot_logs (user_email, id);
+-- admin listings read the newest rows: a MergeAppend over each partition's index
+-- scan (no ordered Append while the DEFAULT partition exists), so the cost grows
+-- with the number of partitions kept, not with the rows in them
+CREATE INDEX IF NOT EXISTS chatbot_logs_created_at_idx ON chatbot_logs (created_at DESC);
+
+-- Creates the monthly partition holding month_start (moving any rows that already
+-- landed in the default partition). Large bot_response values are pushed to TOAST
+-- early (toast_tuple_target) and lz4-compressed where the server supports it.
+CREATE OR REPLACE FUNCTION ensure_chatbot_logs_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+  lo TIMESTAMP := date_trunc('month', month_start);
+  hi TIMESTAMP := date_trunc('month', month_start) + INTERVAL '1 month';
+  part TEXT := format('chatbot_logs_%s', to_char(month_start, 'YYYY_MM'));
+BEGIN
+  IF to_regclass(part) IS NOT NULL THEN
+    RETURN part;
+  END IF;
+  EXECUTE format('CREATE TABLE %I (LIKE chatbot_logs INCLUDING DEFAULTS) WITH (toast_tuple_target = 256)', part);
+  BEGIN
+    EXECUTE format('ALTER TABLE %I ALTER COLUMN bot_response SET COMPRESSION lz4', part);
+  EXCEPTION WHEN others THEN
+    RAISE NOTICE 'lz4 unavailable, keeping default TOAST compression for %', part;
+  END;
+  EXECUTE format('INSERT INTO %I SELECT * FROM chatbot_logs_default WHERE created_at >= %L AND created_at < %L', part, lo, hi);
+  EXECUTE format('DELETE FROM chatbot_logs_default WHERE created_at >= %L AND created_at < %L', lo, hi);
+  EXECUTE format('ALTER TABLE chatbot_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+  RETURN part;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_chatbot_logs_partition((date_trunc('month', NOW()) + make_interval(months => m))::date)
+FROM generate_series(0, 2) AS m;
+
+-- compacted stylist chat history; turns with id > summarized_through are still "recent"
+CREATE TABLE IF NOT EXISTS chat_sessions (
+  user_email TEXT PRIMARY KEY,
+  summary TEXT,
+  summarized_through INT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT NOW()
 );
 
 CREATE TABLE IF NOT EXISTS contact_messages (
@@ -55,3 +117,46 @@ CREATE TABLE IF NOT EXISTS contact_messages (
   message TEXT NOT NULL,
   created_at TIMESTAMP DEFAULT NOW()
 );
+
+CREATE INDEX IF NOT EXISTS contact_messages_created_at_idx ON contact_messages (created_at);
+
+-- HTTP cache validators: every write statement bumps its table's version,
+-- which the read routes turn into ETags (see http_cache.py)
+CREATE TABLE IF NOT EXISTS cache_versions (
+  name TEXT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_cache_version() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO cache_versions (name, version) VALUES (TG_TABLE_NAME, 1)
+  ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_cache_version ON products;
+CREATE TRIGGER products_cache_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON products
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version();
+
+DROP TRIGGER IF EXISTS users_cache_version ON users;
+CREATE TRIGGER users_cache_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version();
+
+DROP TRIGGER IF EXISTS wishlist_cache_version ON wishlist;
+CREATE TRIGGER wishlist_cache_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON wishlist
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version();
+
+DROP TRIGGER IF EXISTS chatbot_logs_cache_version ON chatbot_logs;
+CREATE TRIGGER chatbot_logs_cache_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON chatbot_logs
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version();
+
+-- integer user keys (session tokens carry users.id); backfill rows written before
+-- the column existed. user_email stays until every client sends tokens.
+ALTER TABLE wishlist ADD COLUMN IF NOT EXISTS user_id INT REFERENCES users(id) ON DELETE CASCADE;
+UPDATE wishlist w SET user_id = u.id FROM users u WHERE w.user_id IS NULL AND u.username = w.user_email;
+CREATE UNIQUE INDEX IF NOT EXISTS wishlist_user_id_product_idx ON wishlist (user_id, product_id);
+
+ALTER TABLE chatbot_logs ADD COLUMN IF NOT EXISTS user_id INT;
+UPDATE chatbot_logs c SET user_id = u.id FROM users u WHERE c.user_id IS NULL AND u.username = c.user_email;
+CREATE INDEX IF NOT EXISTS chatbot_logs_user_id_idx ON chatbot_logs (user_id, id);
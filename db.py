@@ -0,0 +1,161 @@
+import os
+import threading
+from urllib.parse import urlparse
+
+import psycopg2
+from psycopg2 import extensions
+
+# Per-process connection pool for the Flask app. Connections are opened lazily,
+# kept for reuse (so statements prepared on them stay prepared, see queries.run)
+# and handed back by PooledConnection.close(). A checkout that would exceed
+# DB_POOL_MAX waits up to DB_POOL_TIMEOUT seconds for a connection to come back.
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+def connect_params() -> dict:
+    """
+    psycopg2 connection kwargs. Prefer DATABASE_URL (Render/Heroku style); fall back
+    to discrete env vars for local dev. On Render, sslmode=require is important.
+    """
+    db_url = os.getenv("DATABASE_URL")
+    if db_url:
+        u = urlparse(db_url)
+        return {
+            "dbname": u.path.lstrip("/"),
+            "user": u.username,
+            "password": u.password,
+            "host": u.hostname,
+            "port": u.port or 5432,
+            "sslmode": "require",
+        }
+    # Local dev fallback (no hardcoded password defaults)
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "dbname": os.getenv("DB_NAME", "Palleteandfit"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASS", ""),
+    }
+
+def asyncpg_params() -> dict:
+    """The same settings spelled for asyncpg.connect()/create_pool()."""
+    params = dict(connect_params())
+    params["database"] = params.pop("dbname")
+    if params.pop("sslmode", None):
+        params["ssl"] = "require"
+    return params
+
+class Connection(extensions.connection):
+    """psycopg2 connection that remembers which registry statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class PoolTimeout(Exception):
+    pass
+
+class ConnectionPool:
+    """`connect` must return a db.Connection (pass connection_factory=Connection)."""
+
+    def __init__(self, connect, maxconn=POOL_MAX, timeout=POOL_TIMEOUT):
+        self._connect = connect
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._maxconn = maxconn
+        self._idle = []
+        self._lock = threading.Lock()
+        self._generation = 0
+        # close idle sockets in the parent before forking (gunicorn --preload) so a
+        # child never shares one; the child starts with an empty pool
+        os.register_at_fork(before=self.close_idle, after_in_child=self._after_fork)
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise PoolTimeout(f"no database connection free within {self._timeout}s (DB_POOL_MAX={self._maxconn})")
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None or conn.closed:
+                conn = self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+        return PooledConnection(self, conn, self._generation)
+
+    def putconn(self, conn, generation=None):
+        if generation is not None and generation != self._generation:
+            # checked out before a fork: its slot belonged to the parent's semaphore,
+            # so drop it without touching this process's idle list or slots
+            conn.close()
+            return
+        try:
+            if not conn.closed:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    conn.close()
+                else:
+                    if status != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                    # undo per-checkout session tweaks (seed scripts, retention job)
+                    if conn.autocommit:
+                        conn.autocommit = False
+                    if conn.isolation_level != extensions.ISOLATION_LEVEL_DEFAULT:
+                        conn.set_session(isolation_level="DEFAULT")
+        except psycopg2.Error:
+            conn.close()
+        finally:
+            if not conn.closed:
+                with self._lock:
+                    self._idle.append(conn)
+            self._slots.release()
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _after_fork(self):
+        # anything checked out in the parent at fork time is never returned here
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self._maxconn)
+        self._generation += 1
+
+class PooledConnection:
+    """
+    A checked-out connection. Behaves like the psycopg2 connection except that
+    close() (or leaving a `with` block, or garbage collection) returns it to the pool.
+    """
+
+    __slots__ = ("_pool", "_conn", "_generation")
+
+    def __init__(self, pool, conn, generation):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_generation", generation)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool.putconn(conn, self._generation)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+        self.close()
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,117 @@
+"""
+Deterministic stand-in for google.generativeai.GenerativeModel.
+
+Selected with LLM_BACKEND=fake so the recommendation path can be exercised
+offline (load tests, local dev) without a GOOGLE_API_KEY.
+
+Env knobs:
+  FAKE_LLM_LATENCY     fixed:MS | uniform:LO_MS:HI_MS | lognormal:MEDIAN_MS:SIGMA  (default lognormal:800:0.5)
+  FAKE_LLM_ERROR_RATE  fraction of calls that raise FakeModelError (default 0)
+  FAKE_LLM_SEED        seed for latency/error sampling (default 1234)
+  FAKE_LLM_CHUNKS      number of chunks when streaming (default 8)
+"""
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+
+class FakeModelError(RuntimeError):
+    """Injected upstream failure (stands in for quota / 5xx errors from the API)."""
+
+def parse_latency(spec: str):
+    """Turn a FAKE_LLM_LATENCY spec into a sampler returning seconds."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    nums = [float(a) for a in args.split(":") if a]
+    if kind == "fixed":
+        ms = nums[0] if nums else 0.0
+        return lambda rng: ms / 1000
+    if kind == "uniform":
+        lo, hi = nums
+        return lambda rng: rng.uniform(lo, hi) / 1000
+    if kind == "lognormal":
+        median, sigma = nums
+        mu = math.log(median)
+        return lambda rng: rng.lognormvariate(mu, sigma) / 1000
+    raise ValueError(f"Unknown FAKE_LLM_LATENCY spec: {spec}")
+
+LATENCY = parse_latency(os.getenv("FAKE_LLM_LATENCY", "lognormal:800:0.5"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+STREAM_CHUNKS = int(os.getenv("FAKE_LLM_CHUNKS", "8"))
+
+_rng = random.Random(int(os.getenv("FAKE_LLM_SEED", "1234")))
+_rng_lock = threading.Lock()
+
+def _draw():
+    with _rng_lock:
+        return LATENCY(_rng), _rng.random() < ERROR_RATE
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.cached_content_token_count = 0
+        self.total_token_count = prompt_tokens + output_tokens
+
+class FakeResponse:
+    def __init__(self, text, usage, chunks=None):
+        self.text = text
+        self.usage_metadata = usage
+        self._chunks = chunks
+
+    def __iter__(self):
+        # streaming mode yields partial responses, like the real client
+        for chunk, delay in self._chunks or [(self.text, 0)]:
+            time.sleep(delay)
+            yield FakeResponse(chunk, self.usage_metadata)
+
+    def resolve(self):
+        for _ in self:
+            pass
+
+def _fake_reply(prompt: str, max_tokens: int) -> str:
+    # same prompt -> same answer, so runs are reproducible
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    colors = ["Emerald", "Maroon", "Navy", "Mustard", "Ivory", "Teal", "Blush", "Charcoal"]
+    best, worst = colors[digest[0] % len(colors)], colors[digest[1] % len(colors)]
+    light = 30 + digest[2] % 41
+    western = 20 + digest[3] % 61
+    text = (
+        f"Best color: {best}\n"
+        f"Worst color: {worst}\n"
+        f"Light tones: {light}\n"
+        f"Dark tones: {100 - light}\n"
+        f"Western styles: {western}\n"
+        f"Eastern styles: {100 - western}\n"
+        f"Personalized tip: Pair {best.lower()} with neutral accessories and keep {worst.lower()} away from your face."
+    )
+    # respect the output budget roughly (4 chars per token)
+    return text[: max_tokens * 4]
+
+class FakeGenerativeModel:
+    def __init__(self, model_name="fake", system_instruction=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        config = generation_config or {}
+        max_tokens = config.get("max_output_tokens", 1024)
+        prompt = contents if isinstance(contents, str) else str(contents)
+        latency, fail = _draw()
+        text = _fake_reply(prompt, max_tokens)
+        usage = _Usage(len(prompt) // 4 + 1, len(text) // 4 + 1)
+
+        if not stream:
+            time.sleep(latency)
+            if fail:
+                raise FakeModelError("429 Resource has been exhausted (injected)")
+            return FakeResponse(text, usage)
+
+        if fail:
+            time.sleep(latency)
+            raise FakeModelError("503 Service unavailable (injected)")
+        size = max(len(text) // STREAM_CHUNKS, 1)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        delay = latency / max(len(pieces), 1)
+        return FakeResponse(text, usage, chunks=[(p, delay) for p in pieces])
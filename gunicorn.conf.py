@@ -0,0 +1,29 @@
+import os
+import shutil
+
+# Prometheus multiprocess mode: each worker writes its samples to this
+# directory and /metrics aggregates them. Must be set before app import.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/palettefit-metrics")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Client addresses: gunicorn passes the proxy's address through as REMOTE_ADDR.
+# app.py rewrites it from X-Forwarded-For (werkzeug ProxyFix) when
+# RATE_LIMIT_PROXY_HOPS is set: 1 on Render (the default there), the number of
+# proxies in front of gunicorn elsewhere. Leave it at 0 only when clients connect
+# directly, or the rate limiter puts everyone in the proxy's bucket.
+# Import app.py once in the master and fork workers from it (shared pages, faster
+# boots). Safe because the Gemini client, sampler thread and DB connections are
+# all created lazily inside each worker.
+preload_app = os.getenv("GUNICORN_PRELOAD") == "1"
+
+def on_starting(server):
+    # stale files from a previous run would be summed into the new counters
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import make_response, request
+
+import db
+import queries
+
+# Table versions are bumped by triggers (see create_tables.sql). Each worker keeps
+# them for VERSION_TTL seconds, so most revalidations never touch the database.
+VERSION_TTL = float(os.getenv("CACHE_VERSION_TTL", "2"))
+# no-cache: clients may store responses but revalidate every use. The ETag makes
+# that a cheap 304, and a product edit or delete shows up on the next load.
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, no-cache")
+ADMIN_CACHE_CONTROL = os.getenv("ADMIN_CACHE_CONTROL", "private, no-cache")
+
+_connect = None
+_versions = {}
+_lock = threading.Lock()
+
+def init(connect):
+    global _connect
+    _connect = connect
+
+def invalidate(*tables):
+    """Forget cached versions after a local write so this worker revalidates at once."""
+    with _lock:
+        for table in tables:
+            _versions.pop(table, None)
+
+def cached_versions(tables, now):
+    """Versions still fresh in this worker's cache: {table: version}."""
+    fresh = {}
+    with _lock:
+        for table in tables:
+            cached = _versions.get(table)
+            if cached is not None and now - cached[1] < VERSION_TTL:
+                fresh[table] = cached[0]
+    return fresh
+
+def remember_versions(missing, found, now):
+    """Cache versions just read from cache_versions (absent rows are version 0)."""
+    versions = {table: found.get(table, 0) for table in missing}
+    with _lock:
+        for table, version in versions.items():
+            _versions[table] = (version, now)
+    return versions
+
+def table_versions(tables):
+    now = time.monotonic()
+    fresh = cached_versions(tables, now)
+    missing = [t for t in tables if t not in fresh]
+    if missing:
+        conn = _connect()
+        cur = conn.cursor()
+        queries.run(cur, queries.CACHE_VERSIONS, (missing,))
+        found = dict(cur.fetchall())
+        cur.close()
+        conn.close()
+        fresh.update(remember_versions(missing, found, now))
+    return [fresh[t] for t in tables]
+
+def etag_for(versions):
+    return "v" + "-".join(str(v) for v in versions)
+
+def conditional(*tables, cache_control=CATALOG_CACHE_CONTROL):
+    """
+    ETag/304 handling for read routes whose body only depends on `tables`.
+    A matching If-None-Match returns 304 before the view (and its query) runs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                etag = etag_for(table_versions(tables))
+            except db.PoolTimeout:
+                raise  # the view would wait for the same pool; answer 503 now
+            except Exception as e:
+                # validators are an optimization; never fail the request over them
+                print("Cache version lookup failed:", e)
+                return view(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # weak: the same representation may be sent gzip/brotli/identity
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = cache_control
+            # a 304 must carry the same Vary as the (compressed) 200 it stands for
+            response.vary.add("Accept-Encoding")
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ----------------- Model backend -----------------
+# LLM_BACKEND=fake swaps in the deterministic local stand-in (fake_llm.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+# Everything static lives in the system instruction, set once on the per-process
+# model, so the per-request prompt is only the profile + history + question.
+# (Explicit provider context caching needs a 32k-token prefix; this one is ~100
+# tokens, so it is not used. Any implicit cache hits still show up in
+# usage["cached_tokens"].)
+SYSTEM_INSTRUCTION = (
+    "You are a sophisticated Personalized Fashion Stylist AI, designed specifically for a Pakistani audience.\n"
+    "Give a detailed, friendly, practical fashion recommendation for a Pakistani audience using the user's info. "
+    "Suggest the best and worst colors, recommend percentage fit for lighter/darker tones and western/eastern styles, "
+    "and include a personalized analysis/tip for the user."
+)
+
+# ----------------- Token budget -----------------
+# max_output_tokens per tier; clients pick one with {"tier": "..."}
+OUTPUT_TOKEN_TIERS = {
+    "brief": 256,
+    "standard": 1024,
+    "detailed": 2048,
+}
+DEFAULT_TIER = os.getenv("RECOMMENDATION_TIER", "standard")
+MAX_QUERY_CHARS = int(os.getenv("MAX_QUERY_CHARS", "2000"))
+TRUNCATION_MARKER = "\n[...]\n"
+
+SUMMARY_INSTRUCTION = (
+    "Summarize this fashion stylist conversation in a few short lines. Keep the user's stated preferences, "
+    "occasions, budget and constraints, and the key advice already given. Do not add new advice."
+)
+
+MODEL_INSTRUCTIONS = {
+    "stylist": SYSTEM_INSTRUCTION,
+    "summary": SUMMARY_INSTRUCTION,
+}
+
+# ----------------- Lazy, per-process client state -----------------
+# google.generativeai (grpc/protobuf) is only imported on the first model call,
+# so catalog-only workers, CLI tools and tests never pay for it. The state is
+# dropped in forked children: grpc channels must not cross a fork, which keeps
+# gunicorn --preload safe.
+genai = None
+_models = {}
+_lock = threading.Lock()
+
+def _reset_after_fork():
+    global genai, _lock
+    genai = None
+    _models.clear()
+    _lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _model_class():
+    global genai
+    if LLM_BACKEND == "fake":
+        import fake_llm
+        return fake_llm.FakeGenerativeModel
+    if genai is None:
+        import google.generativeai as client
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("No GOOGLE_API_KEY set for Flask application")
+        client.configure(api_key=api_key)
+        genai = client
+    return genai.GenerativeModel
+
+def get_model(kind: str = "stylist"):
+    model = _models.get(kind)
+    if model is None:
+        with _lock:
+            model = _models.get(kind)
+            if model is None:
+                model = _model_class()(model_name=MODEL_NAME, system_instruction=MODEL_INSTRUCTIONS[kind])
+                _models[kind] = model
+    return model
+
+def resolve_tier(tier):
+    return tier if tier in OUTPUT_TOKEN_TIERS else DEFAULT_TIER
+
+def truncate_query(text: str, limit: int = MAX_QUERY_CHARS) -> str:
+    """Keep the head and tail of an over-long query; the middle is usually the least useful part."""
+    text = (text or "").strip()
+    if len(text) <= limit:
+        return text
+    keep = limit - len(TRUNCATION_MARKER)
+    head = keep * 2 // 3
+    tail = keep - head
+    return text[:head] + TRUNCATION_MARKER + text[-tail:]
+
+def build_prompt(user_profile_context: str, user_query: str, history: str = "") -> str:
+    if history:
+        user_profile_context = f"{user_profile_context}\n\nConversation so far:\n{history}"
+    return f"{user_profile_context}\n\nThe user asks: {truncate_query(user_query)}\n"
+
+def profile_context(profile) -> str:
+    """Prompt block for a (name, age, gender, skin_tone, weight, body_length, upper_width, lower_width) row."""
+    if not profile:
+        return "No user profile found."
+    name, age, gender, skin_tone, weight, body_length, upper_width, lower_width = profile
+    return (
+        f"User profile:\n"
+        f"- Name: {name}\n"
+        f"- Age: {age}\n"
+        f"- Gender: {gender}\n"
+        f"- Skin tone: {skin_tone}\n"
+        f"- Weight: {weight} kg\n"
+        f"- Body length: {body_length} in\n"
+        f"- Upper body width: {upper_width} in\n"
+        f"- Lower body width: {lower_width} in\n"
+    )
+
+FIELD_PATTERNS = {
+    "best_color": r"Best color: ?([^\n]+)",
+    "worst_color": r"Worst color: ?([^\n]+)",
+    "light_tones_percent": r"Light tones: ?(\d+)",
+    "dark_tones_percent": r"Dark tones: ?(\d+)",
+    "western_percent": r"Western styles?: ?(\d+)",
+    "eastern_percent": r"Eastern styles?: ?(\d+)",
+    "personalized_analysis": r"Personalized tip: ?([^\n]+)",
+}
+
+def extract_fields(text: str) -> dict:
+    """Pull the structured fields saved on users out of a recommendation."""
+    fields = dict.fromkeys(FIELD_PATTERNS)
+    for key, pat in FIELD_PATTERNS.items():
+        m = re.search(pat, text, re.IGNORECASE)
+        if m:
+            val = m.group(1).strip()
+            if "percent" in key and val.isdigit():
+                val = int(val)
+            fields[key] = val
+    if not fields["personalized_analysis"]:
+        fields["personalized_analysis"] = text
+    return fields
+
+def summarize_history(previous_summary: str, turns, max_output_tokens: int) -> str:
+    """Fold older (question, answer) turns into the running conversation summary."""
+    parts = []
+    if previous_summary:
+        parts.append(f"Summary so far:\n{previous_summary}\n")
+    for question, answer in turns:
+        parts.append(f"User: {question}\nStylist: {answer}")
+    response = get_model("summary").generate_content(
+        "\n".join(parts),
+        generation_config={"max_output_tokens": max_output_tokens},
+    )
+    return response.text.strip()
+
+def generate_recommendation(prompt: str, tier: str = None):
+    """
+    Run one generation under the tier's output budget.
+    Returns (text, usage) where usage holds token counts and latency for chatbot_logs.
+    """
+    tier = resolve_tier(tier)
+    started = time.perf_counter()
+    response = get_model("stylist").generate_content(
+        prompt,
+        generation_config={"max_output_tokens": OUTPUT_TOKEN_TIERS[tier]},
+    )
+    latency_ms = int((time.perf_counter() - started) * 1000)
+    meta = getattr(response, "usage_metadata", None)
+    usage = {
+        "tier": tier,
+        "prompt_tokens": getattr(meta, "prompt_token_count", None),
+        "output_tokens": getattr(meta, "candidates_token_count", None),
+        "cached_tokens": getattr(meta, "cached_content_token_count", None),
+        "latency_ms": latency_ms,
+    }
+    return response.text, usage
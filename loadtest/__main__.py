@@ -0,0 +1,79 @@
+"""
+Offline load test for the chat, catalog and wishlist endpoints.
+
+Start the API against a local Postgres with the fake model, e.g.
+
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=lognormal:800:0.5 RATE_LIMIT_ENABLED=0 \
+        gunicorn -w 4 --threads 4 -b 127.0.0.1:5001 app:app
+
+then run
+
+    python -m loadtest --scenario mixed --concurrency 32 --duration 60 \
+        --server-capacity 16 --setup --json results.json
+"""
+import argparse
+import asyncio
+import json
+
+from loadtest.driver import HttpClient, run
+from loadtest.scenarios import SCENARIOS, user_email
+
+async def setup_users(base_url, users):
+    """Register the virtual users (409 for ones that already exist is fine)."""
+    client = HttpClient(base_url)
+    try:
+        for i in range(users):
+            await client.request("POST", "/api/register", {
+                "username": user_email(i), "password": "loadtest-password",
+                "name": f"Load Test {i}", "age": 20 + i % 30,
+                "gender": "Female" if i % 2 else "Male", "skin_tone": "medium",
+            })
+    finally:
+        await client.close()
+
+async def fetch_product_ids(base_url):
+    client = HttpClient(base_url)
+    try:
+        status, data = await client.request("GET", "/api/products")
+    finally:
+        await client.close()
+    if status != 200:
+        return []
+    return [p["id"] for p in json.loads(data)]
+
+def print_report(result):
+    print(f"elapsed {result['elapsed_s']}s  requests {result['requests']}  "
+          f"throughput {result['throughput_rps']} req/s  in-flight {result['mean_in_flight']}")
+    if "worker_saturation" in result:
+        print(f"worker saturation {result['worker_saturation'] * 100:.1f}%")
+    print(f"{'endpoint':<20}{'reqs':>8}{'errs':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, e in result["endpoints"].items():
+        print(f"{name:<20}{e['requests']:>8}{e['errors']:>7}{e['rps']:>9}"
+              f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}{e['max_ms']:>9}")
+
+async def main(args):
+    if args.setup:
+        await setup_users(args.base_url, args.users)
+    product_ids = await fetch_product_ids(args.base_url)
+    scenario = SCENARIOS[args.scenario](args.users, product_ids, seed=args.seed)
+    result = await run(args.base_url, scenario, args.concurrency, args.duration, args.server_capacity)
+    result["scenario"] = args.scenario
+    result["concurrency"] = args.concurrency
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PaletteFit load test")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5001")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--server-capacity", type=int,
+                        help="gunicorn workers x threads, used to report worker saturation")
+    parser.add_argument("--setup", action="store_true", help="register the virtual users first")
+    parser.add_argument("--json", help="write the machine-readable result to this file")
+    asyncio.run(main(parser.parse_args()))
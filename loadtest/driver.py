@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlparse
+
+# ----------------- Minimal async HTTP/1.1 client -----------------
+class HttpClient:
+    """One keep-alive connection per virtual user; reconnects when the server closes it."""
+
+    def __init__(self, base_url: str):
+        u = urlparse(base_url)
+        self.host = u.hostname
+        self.port = u.port or 80
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body=None):
+        if self.writer is None:
+            await self._connect()
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Accept: application/json\r\n"
+            "Connection: keep-alive\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+        )
+        if payload:
+            head += "Content-Type: application/json\r\n"
+        self.writer.write(head.encode() + b"\r\n" + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            data = b""
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                data += await self.reader.readexactly(size)
+                await self.reader.readline()
+        elif "content-length" in headers:
+            data = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await self.reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, data
+
+# ----------------- Stats -----------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[k]
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, name, seconds, status):
+        self.latencies.setdefault(name, []).append(seconds)
+        key = (name, status)
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        if status is None or status >= 500:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed, server_capacity=None):
+        endpoints = {}
+        total_requests = 0
+        busy_seconds = 0.0
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            total_requests += len(values)
+            busy_seconds += sum(values)
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+                "statuses": {str(s): c for (n, s), c in self.statuses.items() if n == name},
+            }
+        # Little's law: mean requests in flight = throughput x mean latency
+        in_flight = busy_seconds / elapsed if elapsed else 0.0
+        result = {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total_requests,
+            "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+            "mean_in_flight": round(in_flight, 2),
+            "endpoints": endpoints,
+        }
+        if server_capacity:
+            result["worker_saturation"] = round(in_flight / server_capacity, 3)
+        return result
+
+# ----------------- Closed-loop runner -----------------
+async def _virtual_user(index, base_url, scenario, stats, deadline):
+    client = HttpClient(base_url)
+    state = scenario.new_user(index)
+    try:
+        while time.perf_counter() < deadline:
+            name, method, path, body = scenario.next_request(state)
+            started = time.perf_counter()
+            try:
+                status, _ = await client.request(method, path, body)
+            except Exception:
+                status = None
+                await client.close()
+            stats.record(name, time.perf_counter() - started, status)
+    finally:
+        await client.close()
+
+async def run(base_url, scenario, concurrency, duration, server_capacity=None):
+    stats = Stats()
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*[
+        _virtual_user(i, base_url, scenario, stats, deadline) for i in range(concurrency)
+    ])
+    return stats.summary(time.perf_counter() - started, server_capacity)
@@ -0,0 +1,80 @@
+import random
+from urllib.parse import quote
+
+CATEGORIES = ["Summer", "Winter", "Wedding", "Vacation"]
+GENDERS = ["Men Wear", "Women Wear"]
+QUERIES = [
+    "What should I wear to a mehndi in December?",
+    "Suggest an office look for summer.",
+    "Which colors suit me for a beach vacation?",
+    "Is maroon a good choice for a barat outfit?",
+    "Can I wear pastels in winter?",
+]
+
+def user_email(index: int) -> str:
+    return f"loadtest+{index}@example.com"
+
+class Scenario:
+    """Picks the next (name, method, path, body) for one virtual user."""
+
+    def __init__(self, users: int, product_ids, seed: int = 42):
+        self.users = max(users, 1)
+        self.product_ids = list(product_ids) or [1]
+        self.seed = seed
+
+    def new_user(self, index):
+        return {"email": user_email(index % self.users), "rng": random.Random(self.seed + index)}
+
+    def next_request(self, state):
+        raise NotImplementedError
+
+class ChatScenario(Scenario):
+    def next_request(self, state):
+        rng = state["rng"]
+        body = {"email": state["email"], "query": rng.choice(QUERIES), "tier": "brief"}
+        return "chat", "POST", "/api/recommendation", body
+
+class CatalogScenario(Scenario):
+    def next_request(self, state):
+        rng = state["rng"]
+        if rng.random() < 0.3:
+            return "catalog:all", "GET", "/api/products", None
+        path = f"/api/products/category/{quote(rng.choice(CATEGORIES))}?gender={quote(rng.choice(GENDERS))}"
+        return "catalog:category", "GET", path, None
+
+class WishlistScenario(Scenario):
+    def next_request(self, state):
+        rng = state["rng"]
+        roll = rng.random()
+        if roll < 0.6:
+            return "wishlist:get", "GET", f"/api/wishlist?email={quote(state['email'])}", None
+        body = {"email": state["email"], "product_id": rng.choice(self.product_ids)}
+        if roll < 0.8:
+            return "wishlist:add", "POST", "/api/wishlist", body
+        return "wishlist:remove", "DELETE", "/api/wishlist", body
+
+class MixedScenario(Scenario):
+    """Rough production mix: mostly catalog, some wishlist, a little chat."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.parts = [
+            (0.70, CatalogScenario(*args, **kwargs)),
+            (0.25, WishlistScenario(*args, **kwargs)),
+            (0.05, ChatScenario(*args, **kwargs)),
+        ]
+
+    def next_request(self, state):
+        roll = state["rng"].random()
+        for weight, scenario in self.parts:
+            if roll < weight:
+                return scenario.next_request(state)
+            roll -= weight
+        return self.parts[0][1].next_request(state)
+
+SCENARIOS = {
+    "chat": ChatScenario,
+    "catalog": CatalogScenario,
+    "wishlist": WishlistScenario,
+    "mixed": MixedScenario,
+}
@@ -0,0 +1,158 @@
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+from psycopg2.extensions import cursor as _pg_cursor
+
+import profiling
+
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) so every worker's
+# samples are aggregated by /metrics instead of only the worker that served the scrape.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+SERVER_TIMING = os.getenv("SERVER_TIMING") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "End-to-end request latency",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+PHASE_LATENCY = Histogram(
+    "http_request_phase_seconds", "Time spent per phase (db, db_acquire, llm, serialize, compress, smtp) within a request",
+    ["route", "phase"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_SIZE = Histogram("http_request_size_bytes", "Request body size", ["route"], buckets=SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size", ["route"], buckets=SIZE_BUCKETS)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed", ["route"])
+STATEMENT_LATENCY = Histogram(
+    "db_statement_duration_seconds", "Execution time per registered statement (see queries.py)",
+    ["statement"], buckets=LATENCY_BUCKETS,
+)
+STATEMENT_ROWS = Counter("db_statement_rows_total", "Rows returned or affected per registered statement", ["statement"])
+RATE_LIMITED = Counter("rate_limited_total", "Requests rejected by the rate limiter (rate) or load shedder (shed)", ["route", "reason"])
+
+# ----------------- Per-request phase timing -----------------
+def _route():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return "unmatched" if has_request_context() else "background"
+
+def add_phase(phase: str, seconds: float):
+    route = _route()
+    PHASE_LATENCY.labels(route, phase).observe(seconds)
+    if has_request_context():
+        timings = g.setdefault("phase_timings", {})
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+def observe_statement(name: str, seconds: float, rows: int):
+    STATEMENT_LATENCY.labels(name).observe(seconds)
+    if rows and rows > 0:
+        STATEMENT_ROWS.labels(name).inc(rows)
+
+@contextmanager
+def capture_statement(stmt):
+    """
+    Slow-request SQL capture for queries.run: log the registered SQL under its
+    name rather than the PREPARE/EXECUTE text the cursor actually sends.
+    """
+    if not (has_request_context() and g.get("sql_log") is not None):
+        yield
+        return
+    g.sql_statement = stmt.name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.sql_statement = None
+        profiling.record_sql(stmt, time.perf_counter() - started, stmt.name)
+
+@contextmanager
+def timed(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(phase, time.perf_counter() - started)
+
+class TimedCursor(_pg_cursor):
+    """psycopg2 cursor that books execute/fetch time to the current request's "db" phase."""
+
+    def _run(self, method, query, *args):
+        DB_QUERIES.labels(_route()).inc()
+        started = time.perf_counter()
+        try:
+            return method(query, *args)
+        finally:
+            seconds = time.perf_counter() - started
+            add_phase("db", seconds)
+            # statement capture for slow-request profiles (only when profiling is on);
+            # registered statements are captured by capture_statement instead
+            if has_request_context() and g.get("sql_log") is not None and g.get("sql_statement") is None:
+                profiling.record_sql(query, seconds)
+
+    def execute(self, query, vars=None):
+        return self._run(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._run(super().executemany, query, vars_list)
+
+    def fetchone(self):
+        with timed("db"):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        with timed("db"):
+            return super().fetchmany(self.arraysize if size is None else size)
+
+    def fetchall(self):
+        with timed("db"):
+            return super().fetchall()
+
+    def copy_expert(self, sql, file, size=8192):
+        DB_QUERIES.labels(_route()).inc()
+        with timed("db"):
+            return super().copy_expert(sql, file, size)
+
+# ----------------- Flask wiring -----------------
+def _before_request():
+    g.request_started = time.perf_counter()
+
+def _after_request(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = _route()
+    REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(elapsed)
+    REQUEST_SIZE.labels(route).observe(request.content_length or 0)
+    if not response.direct_passthrough and not response.is_streamed:
+        RESPONSE_SIZE.labels(route).observe(response.calculate_content_length() or 0)
+    if SERVER_TIMING:
+        timings = g.get("phase_timings", {})
+        parts = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in timings.items()]
+        parts.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(parts)
+        response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
+def exposition() -> bytes:
+    """Prometheus text for every worker under PROMETHEUS_MULTIPROC_DIR, else this process."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+def metrics_view():
+    return Response(exposition(), content_type=CONTENT_TYPE_LATEST)
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
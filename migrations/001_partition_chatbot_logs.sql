@@ -0,0 +1,87 @@
+-- Convert an existing single-heap chatbot_logs into the monthly-partitioned layout.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/001_partition_chatbot_logs.sql
+--   psql "$DATABASE_URL" -f create_tables.sql   -- recreates indexes/triggers on the new table
+--
+-- Run it before applying the partitioned create_tables.sql to an old database.
+--
+-- Takes an exclusive lock on chatbot_logs for the duration of the copy; run it in a
+-- quiet window. Ids are preserved and the existing sequence is reused, so
+-- chat_sessions.summarized_through stays valid.
+
+BEGIN;
+
+LOCK TABLE chatbot_logs IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE chatbot_logs RENAME TO chatbot_logs_legacy;
+ALTER TABLE chatbot_logs_legacy ALTER COLUMN id DROP DEFAULT;
+ALTER TABLE chatbot_logs_legacy RENAME CONSTRAINT chatbot_logs_pkey TO chatbot_logs_legacy_pkey;
+-- very old databases may predate the accounting/user_id columns
+ALTER TABLE chatbot_logs_legacy ADD COLUMN IF NOT EXISTS user_id INT;
+ALTER TABLE chatbot_logs_legacy ADD COLUMN IF NOT EXISTS tier TEXT;
+ALTER TABLE chatbot_logs_legacy ADD COLUMN IF NOT EXISTS prompt_tokens INT;
+ALTER TABLE chatbot_logs_legacy ADD COLUMN IF NOT EXISTS output_tokens INT;
+ALTER TABLE chatbot_logs_legacy ADD COLUMN IF NOT EXISTS cached_tokens INT;
+ALTER TABLE chatbot_logs_legacy ADD COLUMN IF NOT EXISTS latency_ms INT;
+
+CREATE TABLE chatbot_logs (
+  id INT NOT NULL DEFAULT nextval('chatbot_logs_id_seq'),
+  user_email TEXT,
+  user_id INT,
+  question TEXT,
+  bot_response TEXT,
+  tier TEXT,
+  prompt_tokens INT,
+  output_tokens INT,
+  cached_tokens INT,
+  latency_ms INT,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE chatbot_logs_default PARTITION OF chatbot_logs DEFAULT;
+ALTER SEQUENCE chatbot_logs_id_seq OWNED BY chatbot_logs.id;
+
+-- ensure_chatbot_logs_partition() is defined in create_tables.sql; (re)define it
+-- before use in case this database predates it
+CREATE OR REPLACE FUNCTION ensure_chatbot_logs_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+  lo TIMESTAMP := date_trunc('month', month_start);
+  hi TIMESTAMP := date_trunc('month', month_start) + INTERVAL '1 month';
+  part TEXT := format('chatbot_logs_%s', to_char(month_start, 'YYYY_MM'));
+BEGIN
+  IF to_regclass(part) IS NOT NULL THEN
+    RETURN part;
+  END IF;
+  EXECUTE format('CREATE TABLE %I (LIKE chatbot_logs INCLUDING DEFAULTS) WITH (toast_tuple_target = 256)', part);
+  BEGIN
+    EXECUTE format('ALTER TABLE %I ALTER COLUMN bot_response SET COMPRESSION lz4', part);
+  EXCEPTION WHEN others THEN
+    RAISE NOTICE 'lz4 unavailable, keeping default TOAST compression for %', part;
+  END;
+  EXECUTE format('INSERT INTO %I SELECT * FROM chatbot_logs_default WHERE created_at >= %L AND created_at < %L', part, lo, hi);
+  EXECUTE format('DELETE FROM chatbot_logs_default WHERE created_at >= %L AND created_at < %L', lo, hi);
+  EXECUTE format('ALTER TABLE chatbot_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+  RETURN part;
+END;
+$$ LANGUAGE plpgsql;
+
+-- one partition per month from the oldest row up to two months ahead
+SELECT ensure_chatbot_logs_partition(m::date)
+FROM generate_series(
+  date_trunc('month', COALESCE((SELECT MIN(created_at) FROM chatbot_logs_legacy), NOW())),
+  date_trunc('month', NOW()) + INTERVAL '2 months',
+  INTERVAL '1 month'
+) AS m;
+
+INSERT INTO chatbot_logs
+  (id, user_email, user_id, question, bot_response, tier, prompt_tokens, output_tokens, cached_tokens, latency_ms, created_at)
+SELECT id, user_email, user_id, question, bot_response, tier, prompt_tokens, output_tokens, cached_tokens, latency_ms,
+       COALESCE(created_at, NOW())
+FROM chatbot_logs_legacy;
+
+DROP TABLE chatbot_logs_legacy;
+
+COMMIT;
+
+ANALYZE chatbot_logs;
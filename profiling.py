@@ -0,0 +1,171 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import g, jsonify, request
+
+# Everything here is opt-in: with none of these set init_app() registers nothing.
+SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))        # capture stacks + SQL above this
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))       # fraction of requests run under cProfile
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")                        # X-Profile: <token> forces cProfile
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10")) / 1000
+BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "100"))
+MAX_SQL_PER_REQUEST = 200
+MAX_STACK_DEPTH = 40
+
+_buffer = deque(maxlen=BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+_ids = itertools.count(1)
+
+# thread id -> (started, stack Counter) for requests currently being served
+_inflight = {}
+_sampler = None
+_sampler_pid = None
+_sampler_lock = threading.Lock()
+
+def enabled() -> bool:
+    return SLOW_REQUEST_MS > 0 or SAMPLE_RATE > 0 or bool(PROFILE_TOKEN)
+
+# ----------------- Stack sampler -----------------
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+def _sample_loop():
+    # only requests that are already half-way to "slow" get sampled
+    warmup = SLOW_REQUEST_MS / 2000
+    while True:
+        time.sleep(SAMPLE_INTERVAL)
+        if not _inflight:
+            continue
+        now = time.perf_counter()
+        frames = sys._current_frames()
+        for tid, (started, stacks) in list(_inflight.items()):
+            if now - started < warmup:
+                continue
+            frame = frames.get(tid)
+            if frame is not None:
+                stacks[_collapse(frame)] += 1
+
+def _ensure_sampler():
+    # started lazily so each forked gunicorn worker gets its own thread
+    global _sampler, _sampler_pid
+    if _sampler_pid == os.getpid():
+        return
+    with _sampler_lock:
+        if _sampler_pid != os.getpid():
+            _inflight.clear()
+            _sampler = threading.Thread(target=_sample_loop, name="slow-request-sampler", daemon=True)
+            _sampler.start()
+            _sampler_pid = os.getpid()
+
+# ----------------- SQL capture (fed by metrics.TimedCursor) -----------------
+def record_sql(query, seconds: float, name: str = None):
+    log = g.get("sql_log")
+    if log is not None and len(log) < MAX_SQL_PER_REQUEST:
+        if isinstance(query, bytes):
+            query = query.decode("utf-8", "replace")
+        entry = {"sql": " ".join(str(query).split()), "ms": round(seconds * 1000, 2)}
+        if name:
+            entry["statement"] = name
+        log.append(entry)
+
+# ----------------- Flask hooks -----------------
+def _wants_cprofile() -> bool:
+    if PROFILE_TOKEN and request.headers.get("X-Profile") == PROFILE_TOKEN:
+        return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+def _before_request():
+    g.profile_started = time.perf_counter()
+    g.sql_log = []
+    if SLOW_REQUEST_MS > 0:
+        _ensure_sampler()
+        _inflight[threading.get_ident()] = (g.profile_started, Counter())
+    if _wants_cprofile():
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            g.profiler = profiler
+        except ValueError:
+            # another profiler is already active (e.g. a concurrent request on 3.12+)
+            pass
+
+def _after_request(response):
+    started = g.pop("profile_started", None)
+    if started is None:
+        return response
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    sampled = _inflight.pop(threading.get_ident(), None)
+    profiler = g.pop("profiler", None)
+    report = None
+    if profiler is not None:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        report = out.getvalue()
+
+    slow = SLOW_REQUEST_MS > 0 and elapsed_ms >= SLOW_REQUEST_MS
+    if slow or report is not None:
+        entry = {
+            "id": next(_ids),
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "method": request.method,
+            "route": request.url_rule.rule if request.url_rule is not None else request.path,
+            "status": response.status_code,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "slow": slow,
+            "phases_ms": {k: round(v * 1000, 1) for k, v in g.get("phase_timings", {}).items()},
+            "sql": g.get("sql_log") or [],
+            "stacks": sampled[1].most_common(20) if sampled else [],
+            "cprofile": report,
+        }
+        with _buffer_lock:
+            _buffer.append(entry)
+        response.headers["X-Profile-Id"] = str(entry["id"])
+    return response
+
+def _teardown_request(exc):
+    # requests that raised never reach after_request
+    _inflight.pop(threading.get_ident(), None)
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+
+# ----------------- Admin views -----------------
+def list_profiles():
+    with _buffer_lock:
+        entries = list(_buffer)
+    return jsonify([
+        {k: e[k] for k in ("id", "time", "method", "route", "status", "elapsed_ms", "slow")}
+        | {"queries": len(e["sql"]), "profiled": e["cprofile"] is not None}
+        for e in reversed(entries)
+    ])
+
+def get_profile_entry(profile_id):
+    with _buffer_lock:
+        entry = next((e for e in _buffer if e["id"] == profile_id), None)
+    if entry is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify(entry)
+
+def init_app(app):
+    if not enabled():
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/api/admin/profiles", "admin_profiles", list_profiles)
+    app.add_url_rule("/api/admin/profiles/<int:profile_id>", "admin_profile_entry", get_profile_entry)
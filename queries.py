@@ -0,0 +1,319 @@
+import itertools
+import os
+import re
+import time
+
+import metrics
+import sessions
+
+# Every statement the apps issue, by name. SQL is shared by the Flask app (app.py,
+# psycopg2) and the ASGI app (asgi_app.py, asyncpg) and written with psycopg2 %s
+# placeholders; numbered() rewrites them to $n. Most read statements render their
+# JSON response body in Postgres, so both apps return byte-identical payloads.
+#
+# run() executes a statement by name: it is PREPAREd once per pooled connection
+# (db.Connection.prepared) and then only EXECUTEd, so Postgres parses and plans it
+# once per connection instead of once per call. asyncpg does the same through
+# its statement cache. Per-statement latency and row counts are exported as
+# db_statement_duration_seconds / db_statement_rows_total{statement=<name>}.
+#
+# Statements that filter by user come in {"id": ..., "email": ...} pairs: callers
+# with a session token use the integer id, legacy clients the email (see by_user).
+#
+# DB_PREPARE=0 turns server-side prepares off (e.g. behind a transaction-mode
+# pgbouncer, where a session's prepared statements are not guaranteed to exist).
+PREPARE_ENABLED = os.getenv("DB_PREPARE", "1") == "1"
+
+REGISTRY = {}
+
+class Statement(str):
+    """Registered SQL text; still usable anywhere a plain SQL string is."""
+
+    name = None
+
+def statement(name: str, sql: str) -> Statement:
+    if name in REGISTRY:
+        raise ValueError(f"statement {name!r} is already registered")
+    stmt = Statement(sql)
+    stmt.name = name
+    REGISTRY[name] = stmt
+    return stmt
+
+def user_statements(name: str, template: str, id_column: str, email_column: str):
+    """Register the id- and email-keyed variants of a template with one {} column slot."""
+    return {
+        "id": statement(f"{name}_by_id", template.format(id_column)),
+        "email": statement(f"{name}_by_email", template.format(email_column)),
+    }
+
+def by_user(variants, user_id, email):
+    """(statement, key) for the id- or email-keyed variant of a statement."""
+    if user_id is not None:
+        return variants["id"], user_id
+    return variants["email"], email
+
+_PLACEHOLDER = re.compile(r"%s|%%")
+
+def numbered(sql: str) -> str:
+    """psycopg2 placeholders (%s, %% escapes) -> Postgres/asyncpg ($1, $2, ... and %)."""
+    counter = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda m: f"${next(counter)}" if m.group() == "%s" else "%", sql)
+
+def run(cur, stmt: Statement, params=()):
+    """Execute a registered statement on cur, preparing it on this connection first if needed."""
+    started = time.perf_counter()
+    prepared = getattr(cur.connection, "prepared", None)
+    with metrics.capture_statement(stmt):
+        if PREPARE_ENABLED and prepared is not None:
+            if stmt.name not in prepared:
+                cur.execute(f"PREPARE {stmt.name} AS {numbered(stmt)}")
+                prepared.add(stmt.name)
+            if params:
+                cur.execute(f"EXECUTE {stmt.name} ({', '.join(['%s'] * len(params))})", params)
+            else:
+                cur.execute(f"EXECUTE {stmt.name}")
+        else:
+            cur.execute(stmt, params or None)
+    metrics.observe_statement(stmt.name, time.perf_counter() - started, cur.rowcount)
+    return cur
+
+# Product rows rendered to JSON by Postgres (skips per-row Python dicts)
+PRODUCT_JSON = (
+    "json_build_object('id', p.id, 'title', p.title, 'description', p.description, "
+    "'image_url', p.image_url, 'gender', p.gender, 'category', p.category)"
+)
+
+# users columns snapshotted into session tokens (same order as sessions.PROFILE_CLAIMS)
+PROFILE_COLUMNS = ", ".join(sessions.PROFILE_CLAIMS)
+
+# ---------- Auth & profile ----------
+USER_INSERT = statement("user_insert", """
+    INSERT INTO users
+      (username, password, phone, name, age, gender, skin_tone, weight, body_length, upper_width, lower_width)
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    RETURNING id
+""")
+
+LOGIN_LOOKUP = statement(
+    "login_lookup", f"SELECT password, id, username, {PROFILE_COLUMNS} FROM users WHERE username=%s"
+)
+
+PROFILE_UPDATE = user_statements("profile_update", f"""
+    UPDATE users SET
+      name=%s, age=%s, gender=%s, skin_tone=%s,
+      weight=%s, body_length=%s, upper_width=%s, lower_width=%s, phone=%s
+    WHERE {{}}=%s
+    RETURNING id, username, {PROFILE_COLUMNS}
+""", "id", "username")
+
+PROFILE_GET = user_statements("profile_get", """
+    SELECT name, age, gender, skin_tone, weight, body_length, upper_width, lower_width, phone, username,
+           last_recommendation, best_color, worst_color, light_tones_percent, dark_tones_percent,
+           western_percent, eastern_percent, personalized_analysis
+    FROM users WHERE {}=%s
+""", "id", "username")
+
+BODY_UPDATE = user_statements("body_update", f"""
+    UPDATE users SET
+      weight=%s, body_length=%s, upper_width=%s, lower_width=%s
+    WHERE {{}}=%s
+    RETURNING id, username, {PROFILE_COLUMNS}
+""", "id", "username")
+
+# ---------- Products ----------
+_PRODUCTS = f"SELECT COALESCE(json_agg({PRODUCT_JSON}), '[]')::text FROM products p"
+PRODUCTS_ALL = statement("products_all", _PRODUCTS)
+PRODUCTS_BY_CATEGORY = statement("products_by_category", f"{_PRODUCTS} WHERE p.category=%s")
+PRODUCTS_BY_CATEGORY_GENDER = statement(
+    "products_by_category_gender", f"{_PRODUCTS} WHERE p.category=%s AND p.gender=%s"
+)
+PRODUCT_INSERT = statement(
+    "product_insert",
+    "INSERT INTO products (title, description, image_url, gender, category) VALUES (%s,%s,%s,%s,%s) RETURNING id",
+)
+PRODUCT_UPDATE = statement(
+    "product_update",
+    "UPDATE products SET title=%s, description=%s, image_url=%s, gender=%s, category=%s WHERE id=%s",
+)
+PRODUCT_DELETE = statement("product_delete", "DELETE FROM products WHERE id=%s")
+
+# ---------- Recommendations ----------
+PROFILE_BY_EMAIL = statement("profile_by_email", f"SELECT {PROFILE_COLUMNS} FROM users WHERE username=%s")
+
+CHATLOG_INSERT = statement("chatlog_insert", """
+    INSERT INTO chatbot_logs
+      (user_email, user_id, question, bot_response, tier, prompt_tokens, output_tokens, cached_tokens, latency_ms)
+    VALUES (%s, COALESCE(%s, (SELECT id FROM users WHERE username=%s)), %s,%s,%s,%s,%s,%s,%s)
+    RETURNING id
+""")
+
+_RECOMMENDATION_SAVE = """
+    UPDATE users SET
+      last_recommendation=%s,
+      best_color=%s,
+      worst_color=%s,
+      light_tones_percent=%s,
+      dark_tones_percent=%s,
+      western_percent=%s,
+      eastern_percent=%s,
+      personalized_analysis=%s
+    WHERE {}=%s
+"""
+RECOMMENDATION_SAVE = user_statements("recommendation_save", _RECOMMENDATION_SAVE, "id", "username")
+
+# ---------- Wishlist ----------
+_WISHLIST_GET = f"""
+    SELECT json_build_object('wishlist', COALESCE(json_agg({PRODUCT_JSON}), '[]'))::text
+    FROM wishlist w
+    JOIN products p ON w.product_id = p.id
+    WHERE {{}}=%s
+"""
+WISHLIST_GET = user_statements("wishlist_get", _WISHLIST_GET, "w.user_id", "w.user_email")
+
+WISHLIST_ADD = statement("wishlist_add", """
+    INSERT INTO wishlist (user_email, user_id, product_id)
+    VALUES (%s, COALESCE(%s, (SELECT id FROM users WHERE username=%s)), %s)
+    ON CONFLICT DO NOTHING
+""")
+
+_WISHLIST_REMOVE = "DELETE FROM wishlist WHERE {}=%s AND product_id=%s"
+WISHLIST_REMOVE = user_statements("wishlist_remove", _WISHLIST_REMOVE, "user_id", "user_email")
+
+# ---------- Contact ----------
+CONTACT_INSERT = statement("contact_insert", "INSERT INTO contact_messages (email, message) VALUES (%s,%s)")
+
+# ---------- Chat memory (chat_memory.py) ----------
+CHAT_SESSION_GET = statement(
+    "chat_session_get", "SELECT summary, summarized_through FROM chat_sessions WHERE user_email=%s"
+)
+
+# chatbot_logs reads use user_id (chatbot_logs_user_id_idx) for token callers;
+# chat_sessions holds one row per user and stays keyed by email
+CHAT_RECENT_TURNS = user_statements("chat_recent_turns", """
+    SELECT id, question, bot_response FROM chatbot_logs
+    WHERE {}=%s AND id > %s
+    ORDER BY id DESC
+    LIMIT %s
+""", "user_id", "user_email")
+
+CHAT_SESSION_SAVE = statement("chat_session_save", """
+    INSERT INTO chat_sessions (user_email, summary, summarized_through, updated_at)
+    VALUES (%s, %s, %s, NOW())
+    ON CONFLICT (user_email) DO UPDATE SET
+      summary=EXCLUDED.summary,
+      summarized_through=EXCLUDED.summarized_through,
+      updated_at=NOW()
+""")
+
+CHAT_LAST_LOG_ID = user_statements(
+    "chat_last_log_id", "SELECT COALESCE(MAX(id), 0) FROM chatbot_logs WHERE {}=%s", "user_id", "user_email"
+)
+
+# ---------- HTTP cache validators (http_cache.py) ----------
+CACHE_VERSIONS = statement("cache_versions", "SELECT name, version FROM cache_versions WHERE name = ANY(%s)")
+
+# ---------- Admin ----------
+ADMIN_TOTAL_USERS = statement("admin_total_users", "SELECT json_build_object('total_users', COUNT(*))::text FROM users")
+
+ADMIN_WISHLIST_GENDER = statement("admin_wishlist_gender", """
+    SELECT COALESCE(json_object_agg(gender, cnt), '{}')::text
+    FROM (
+      SELECT COALESCE(NULLIF(u.gender, ''), 'Unknown') AS gender, COUNT(*) AS cnt
+      FROM wishlist w
+      JOIN users u ON w.user_email = u.username
+      GROUP BY 1
+    ) g
+""")
+
+ADMIN_MOST_WISHLISTED = statement("admin_most_wishlisted", """
+    SELECT json_build_object(
+             'labels', COALESCE(json_agg(title ORDER BY rank), '[]'),
+             'counts', COALESCE(json_agg(cnt ORDER BY rank), '[]')
+           )::text
+    FROM (
+      SELECT p.title, COUNT(*) AS cnt, row_number() OVER (ORDER BY COUNT(*) DESC) AS rank
+      FROM wishlist w
+      JOIN products p ON w.product_id = p.id
+      GROUP BY p.title
+      ORDER BY cnt DESC
+      LIMIT 5
+    ) top
+""")
+
+ADMIN_SKIN_TONE = statement("admin_skin_tone", """
+    SELECT json_build_object(
+             'labels', COALESCE(json_agg(COALESCE(NULLIF(skin_tone, ''), 'Unknown') ORDER BY skin_tone), '[]'),
+             'counts', COALESCE(json_agg(cnt ORDER BY skin_tone), '[]')
+           )::text
+    FROM (SELECT skin_tone, COUNT(*) AS cnt FROM users GROUP BY skin_tone) t
+""")
+
+ADMIN_AGE_GROUP = statement("admin_age_group", """
+    SELECT json_build_object(
+             'labels', COALESCE(json_agg(age_group ORDER BY age_group), '[]'),
+             'counts', COALESCE(json_agg(cnt ORDER BY age_group), '[]')
+           )::text
+    FROM (
+      SELECT
+          CASE
+              WHEN age BETWEEN 13 AND 18 THEN '13-18'
+              WHEN age BETWEEN 19 AND 25 THEN '19-25'
+              WHEN age BETWEEN 26 AND 35 THEN '26-35'
+              WHEN age BETWEEN 36 AND 50 THEN '36-50'
+              ELSE '50+'
+          END AS age_group,
+          COUNT(*) AS cnt
+      FROM users
+      GROUP BY age_group
+    ) t
+""")
+
+ADMIN_RECENT_WISHLIST = statement("admin_recent_wishlist", """
+    SELECT COALESCE(json_agg(json_build_object('user', user_email, 'product', title) ORDER BY id DESC), '[]')::text
+    FROM (
+      SELECT w.user_email, p.title, w.id FROM wishlist w
+      JOIN products p ON w.product_id = p.id
+      ORDER BY w.id DESC LIMIT 10
+    ) recent
+""")
+
+ADMIN_CHATBOT_LOGS = statement("admin_chatbot_logs", """
+    SELECT COALESCE(json_agg(json_build_object(
+             'user', user_email, 'question', question, 'bot', bot_response,
+             'time', COALESCE(to_char(created_at, 'YYYY-MM-DD HH24:MI'), '')
+           ) ORDER BY created_at DESC), '[]')::text
+    FROM (
+      SELECT user_email, question, bot_response, created_at
+      FROM chatbot_logs
+      ORDER BY created_at DESC
+      LIMIT 10
+    ) recent
+""")
+
+ADMIN_USERS = statement("admin_users", """
+    SELECT COALESCE(json_agg(json_build_object(
+             'id', id,
+             'name', COALESCE(name, ''),
+             'email', username,
+             'gender', COALESCE(gender, ''),
+             'age', CASE WHEN COALESCE(age, 0) = 0 THEN to_json(''::text) ELSE to_json(age) END,
+             'skintone', COALESCE(skin_tone, ''),
+             'joined', COALESCE(to_char(created_at, 'YYYY-MM-DD HH24:MI'), '')
+           ) ORDER BY created_at DESC), '[]')::text
+    FROM users
+""")
+
+ADMIN_MESSAGES = statement("admin_messages", """
+    SELECT COALESCE(json_agg(json_build_object(
+             'user', user_email, 'question', question, 'reply', bot_response,
+             'date', COALESCE(to_char(created_at, 'YYYY-MM-DD HH24:MI'), '')
+           ) ORDER BY created_at DESC), '[]')::text
+    FROM (
+      SELECT user_email, question, bot_response, created_at
+      FROM chatbot_logs
+      ORDER BY created_at DESC
+      LIMIT 100
+    ) recent
+""")
+
+USER_DELETE = statement("user_delete", "DELETE FROM users WHERE id=%s")
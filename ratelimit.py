@@ -0,0 +1,196 @@
+import math
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, request
+
+import metrics
+import sessions
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Token buckets for the expensive routes, one bucket per client IP and one per
+# user. A request spends its cost class's tokens from every bucket it maps to;
+# buckets refill continuously at RATE_LIMIT_<CLASS> = "<burst>/<seconds>".
+#
+# Buckets live in process memory by default (so the effective limit is per gunicorn
+# worker). Set RATE_LIMIT_REDIS_URL to share them through any Redis-compatible
+# server (Redis, Valkey, or a local stand-in in development).
+#
+# Independently of the buckets, each class has a per-process in-flight cap; when it
+# is reached the request is shed with 503 instead of queueing behind busy threads.
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# How many reverse proxies (Render, nginx, ...) append to X-Forwarded-For. Render
+# fronts every web service with one and sets RENDER in its environment; anywhere
+# else behind a proxy this must be set, or every client shares the proxy's bucket.
+# app.py applies it through werkzeug's ProxyFix, so request.remote_addr is the client.
+PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "1" if os.getenv("RENDER") else "0"))
+SHED_RETRY_AFTER = float(os.getenv("RATE_LIMIT_SHED_RETRY_AFTER", "2"))
+
+# class -> (default bucket spec, default in-flight cap per worker)
+COST_CLASSES = {
+    "llm": ("6/60", 2),
+    "auth": ("10/60", 4),
+    "smtp": ("3/300", 2),
+}
+
+def _parse_spec(spec: str):
+    burst, seconds = spec.split("/")
+    burst, seconds = float(burst), float(seconds)
+    return burst, burst / seconds
+
+LIMITS = {
+    name: _parse_spec(os.getenv(f"RATE_LIMIT_{name.upper()}", spec))
+    for name, (spec, _) in COST_CLASSES.items()
+}
+CONCURRENCY = {
+    name: int(os.getenv(f"RATE_LIMIT_{name.upper()}_CONCURRENCY", str(cap)))
+    for name, (_, cap) in COST_CLASSES.items()
+}
+IN_FLIGHT = {name: threading.BoundedSemaphore(cap) for name, cap in CONCURRENCY.items()}
+
+class MemoryStore:
+    """In-process buckets: key -> (tokens, updated_at). Idle full buckets are pruned."""
+
+    PRUNE_EVERY = 1024
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key, burst, rate, cost):
+        """Spend `cost` tokens; returns seconds to wait (0 when allowed)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (cost - tokens) / rate
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # a bucket idle long enough to be full again carries no state
+        for key, (tokens, updated) in list(self._buckets.items()):
+            burst, rate = LIMITS[key.split(":", 1)[0]]
+            if tokens + (now - updated) * rate >= burst:
+                del self._buckets[key]
+
+class RedisStore:
+    """Same bucket arithmetic as MemoryStore, run atomically server-side."""
+
+    SCRIPT = """
+    local burst, rate, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    -- the server clock is shared by every worker; ours may drift between hosts
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url):
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25)
+        self._take = self._client.register_script(self.SCRIPT)
+
+    def take(self, key, burst, rate, cost):
+        return float(self._take(keys=[f"ratelimit:{key}"], args=[burst, rate, cost]))
+
+def _make_store():
+    if REDIS_URL:
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the redis package is not installed")
+        return RedisStore(REDIS_URL)
+    return MemoryStore()
+
+store = _make_store()
+
+_warned_unproxied = False
+
+def warn_if_proxied(forwarded_for):
+    """Say once per worker when proxied traffic is being keyed by the proxy's address."""
+    global _warned_unproxied
+    if forwarded_for and not PROXY_HOPS and not _warned_unproxied:
+        _warned_unproxied = True
+        print("Rate limiter: X-Forwarded-For is present but RATE_LIMIT_PROXY_HOPS=0; "
+              "all clients behind the proxy share one per-IP bucket")
+
+def client_ip():
+    warn_if_proxied(request.headers.get("X-Forwarded-For"))
+    return request.remote_addr or "unknown"
+
+def user_key(claims, data):
+    """Bucket identity for the caller: session uid, else the email in the JSON body."""
+    if claims:
+        return f"uid:{claims['uid']}"
+    email = data.get("email") if isinstance(data, dict) else None
+    if isinstance(email, str) and email.strip():
+        return "email:" + email.strip().lower()
+    return None
+
+def check(cost_class: str, ip: str, user, cost: float = 1.0) -> float:
+    """Spend tokens from the IP and user buckets; seconds to wait, 0 when allowed."""
+    burst, rate = LIMITS[cost_class]
+    keys = [f"{cost_class}:ip:{ip}"]
+    if user:
+        keys.append(f"{cost_class}:{user}")
+    try:
+        return max(store.take(key, burst, rate, cost) for key in keys)
+    except Exception as e:
+        # a limiter outage must not take the routes down with it
+        print("Rate limiter store failed:", e)
+        return 0.0
+
+def _reject(status, reason, retry_after, message):
+    metrics.RATE_LIMITED.labels(request.url_rule.rule, reason).inc()
+    response = jsonify({"error": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def limit(cost_class: str, cost: float = 1.0):
+    """
+    Rate-limit a route under `cost_class` (see COST_CLASSES): 429 when the
+    client's IP or user bucket is empty, 503 when the class is already at its
+    in-flight cap in this worker. Both carry Retry-After.
+    """
+    gate = IN_FLIGHT[cost_class]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return view(*args, **kwargs)
+
+            user = user_key(sessions.current(), request.get_json(silent=True))
+            wait = check(cost_class, client_ip(), user, cost)
+            if wait > 0:
+                return _reject(429, "rate", wait, "Too many requests, please slow down")
+
+            if not gate.acquire(blocking=False):
+                return _reject(503, "shed", SHED_RETRY_AFTER, "Service is busy, please retry shortly")
+            try:
+                return view(*args, **kwargs)
+            finally:
+                gate.release()
+        return wrapper
+    return decorator
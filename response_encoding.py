@@ -0,0 +1,97 @@
+import gzip
+import os
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider, _default
+
+import metrics
+
+# Optional accelerators: fall back to the stdlib paths when they are not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+# ----------------- JSON provider -----------------
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    orjson-backed app.json (same output semantics as Flask's provider: sorted keys,
+    Flask's fallbacks for dates/decimals/uuids). Time spent is booked to "serialize".
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumpb(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def _dumpb(self, obj) -> bytes:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def response(self, *args, **kwargs):
+        with metrics.timed("serialize"):
+            if orjson is None:
+                return super().response(*args, **kwargs)
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(self._dumpb(obj) + b"\n", mimetype=self.mimetype)
+
+def json_text_response(body, status=200):
+    """Pass a JSON document rendered by Postgres (json_agg/json_build_object) straight through."""
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+# ----------------- Compression -----------------
+def _pick_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+def compress_response(response):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = _pick_encoding()
+    if encoding is None:
+        return response
+    with metrics.timed("compress"):
+        if encoding == "br":
+            body = brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
@@ -0,0 +1,55 @@
+import os
+
+from flask import abort, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+# Signed, stateless session tokens issued by /api/login. They carry the numeric
+# user id plus a snapshot of the profile, so hot routes can skip the users lookup.
+# Tokens are refreshed whenever the profile changes (/api/profile, /api/body).
+SECRET_KEY = os.getenv("SECRET_KEY")
+TOKEN_MAX_AGE = int(os.getenv("SESSION_TOKEN_MAX_AGE", str(7 * 24 * 3600)))
+PROFILE_CLAIMS = ("name", "age", "gender", "skin_tone", "weight", "body_length", "upper_width", "lower_width")
+
+# REQUIRE_SESSION_TOKEN=1 turns off the legacy email-in-body identity: once every
+# client sends tokens, a request that names a user without one is a 401
+REQUIRED = os.getenv("REQUIRE_SESSION_TOKEN") == "1"
+if REQUIRED and not SECRET_KEY:
+    raise RuntimeError("REQUIRE_SESSION_TOKEN=1 needs SECRET_KEY to be set")
+
+_serializer = URLSafeTimedSerializer(SECRET_KEY, salt="palettefit-session") if SECRET_KEY else None
+
+def enabled() -> bool:
+    return _serializer is not None
+
+def issue(user_id: int, email: str, profile: dict):
+    """Return a token for this user, or None when SECRET_KEY is not configured."""
+    if _serializer is None:
+        return None
+    claims = {"uid": user_id, "email": email}
+    claims.update({k: profile.get(k) for k in PROFILE_CLAIMS})
+    return _serializer.dumps(claims)
+
+def verify(token: str):
+    """Claims carried by a token, or None when it is forged, malformed or expired."""
+    try:
+        return _serializer.loads(token, max_age=TOKEN_MAX_AGE)
+    except BadSignature:
+        return None
+
+def current():
+    """
+    Claims from the request's `Authorization: Bearer <token>` header, or None when
+    no token was sent (legacy email-in-body clients). A bad or expired token is a 401.
+    """
+    if "session_claims" in g:
+        return g.session_claims
+    claims = None
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        if _serializer is None:
+            abort(401, description="Session tokens are not enabled")
+        claims = verify(header[7:].strip())
+        if claims is None:
+            abort(401, description="Invalid or expired session token")
+    g.session_claims = claims
+    return claims
@@ -0,0 +1,275 @@
+import base64
+import binascii
+import io
+import os
+from functools import lru_cache
+
+import numpy as np
+
+# Server-side skin-tone matching for the camera flow (profile.html / SIGNUP2.html).
+#
+# The client sends a small downscaled camera frame. The skin sample is the centre
+# patch; the surround estimates the light source (shades-of-gray), which is divided
+# out before the patch is converted to CIE Lab and matched against the tone table
+# by CIEDE2000. Matches are memoized on the Lab colour quantized to LAB_STEP, so
+# repeated samples under similar conditions skip the table scan entirely.
+LAB_STEP = float(os.getenv("SKIN_TONE_LAB_STEP", "1.0"))
+MAX_SIDE = int(os.getenv("SKIN_TONE_MAX_SIDE", "160"))
+# Encoded uploads are checked against these before anything is decoded
+MAX_REQUEST_BYTES = int(os.getenv("SKIN_TONE_MAX_BYTES", str(1024 * 1024)))
+MAX_SOURCE_PIXELS = int(os.getenv("SKIN_TONE_MAX_SOURCE_PIXELS", str(1024 * 1024)))
+# caps the white-balance correction per channel: a surround that is mostly one
+# strong colour (a red wall, a blue shirt) must not repaint the skin
+MAX_GAIN = float(os.getenv("SKIN_TONE_MAX_GAIN", "1.5"))
+# Only surround pixels that are both less saturated than the skin sample and at
+# least this far from its (a*, b*) take part in the light estimate. In a close-up
+# the surround is mostly skin too; then too few qualify and no correction is made.
+NEUTRAL_SEPARATION = float(os.getenv("SKIN_TONE_NEUTRAL_SEPARATION", "12"))
+MIN_NEUTRAL_FRACTION = 0.1
+DEFAULT_PATCH = 0.3  # centre patch side, as a fraction of the frame's shorter side
+
+# Same names/order as SKIN_TONES in profile.html and SIGNUP2.html; the name is
+# what users.skin_tone stores, the slider value is the index scaled to 0..100.
+TONES = [
+    ("Porcelain", "#fff0dc"), ("Ivory", "#ffe7c7"), ("Fair", "#fde1c8"),
+    ("Light Beige", "#ffe2b0"), ("Rosy Beige", "#ffe3dd"), ("Vanilla", "#f8e4c2"),
+    ("Peach", "#ffe0b3"), ("Almond", "#f7d9c4"), ("Light", "#fbd2a7"),
+    ("Sand", "#fae0bb"), ("Honey", "#f1c27d"), ("Wheatish", "#eac086"),
+    ("Golden", "#e6a86c"), ("Olive", "#c49e7b"), ("Warm Beige", "#f5c185"),
+    ("Tan", "#b98c6b"), ("Caramel", "#de9e53"), ("Medium Brown", "#a97856"),
+    ("Chestnut", "#ad7d4c"), ("Dusky", "#704214"), ("Copper", "#b47838"),
+    ("Deep", "#8d5524"), ("Rich", "#6d4217"), ("Mocha", "#56351e"),
+]
+
+# ----------------- Colour conversion -----------------
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+_D65 = np.array([0.95047, 1.0, 1.08883])
+
+def _hex_rgb(value):
+    return [int(value[i:i + 2], 16) for i in (1, 3, 5)]
+
+def _to_linear(srgb):
+    """sRGB in 0..1 -> linear light."""
+    return np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+
+def _to_srgb(linear):
+    linear = np.clip(linear, 0.0, 1.0)
+    return np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055)
+
+def linear_to_lab(linear):
+    """(..., 3) linear RGB -> (..., 3) CIE Lab under D65."""
+    xyz = (linear @ _RGB_TO_XYZ.T) / _D65
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
+
+def delta_e_2000(lab, table):
+    """CIEDE2000 between one Lab colour and every row of `table` (N, 3)."""
+    L1, a1, b1 = lab
+    L2, a2, b2 = table[:, 0], table[:, 1], table[:, 2]
+
+    c_bar = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    g = 0.5 * (1 - np.sqrt(c_bar ** 7 / (c_bar ** 7 + 25.0 ** 7)))
+    a1p, a2p = (1 + g) * a1, (1 + g) * a2
+    c1p, c2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+    chroma = c1p * c2p
+
+    dh = h2p - h1p
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(chroma == 0, 0.0, dh)
+    d_l = L2 - L1
+    d_c = c2p - c1p
+    d_h = 2 * np.sqrt(chroma) * np.sin(np.radians(dh / 2))
+
+    l_bar = (L1 + L2) / 2
+    cp_bar = (c1p + c2p) / 2
+    h_sum = h1p + h2p
+    h_bar = np.where(
+        np.abs(h1p - h2p) <= 180, h_sum / 2,
+        np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2),
+    )
+    h_bar = np.where(chroma == 0, h_sum, h_bar)
+
+    t = (1 - 0.17 * np.cos(np.radians(h_bar - 30)) + 0.24 * np.cos(np.radians(2 * h_bar))
+         + 0.32 * np.cos(np.radians(3 * h_bar + 6)) - 0.20 * np.cos(np.radians(4 * h_bar - 63)))
+    d_theta = 30 * np.exp(-(((h_bar - 275) / 25) ** 2))
+    r_c = 2 * np.sqrt(cp_bar ** 7 / (cp_bar ** 7 + 25.0 ** 7))
+    s_l = 1 + 0.015 * (l_bar - 50) ** 2 / np.sqrt(20 + (l_bar - 50) ** 2)
+    s_c = 1 + 0.045 * cp_bar
+    s_h = 1 + 0.015 * cp_bar * t
+    r_t = -np.sin(np.radians(2 * d_theta)) * r_c
+
+    return np.sqrt(
+        (d_l / s_l) ** 2 + (d_c / s_c) ** 2 + (d_h / s_h) ** 2
+        + r_t * (d_c / s_c) * (d_h / s_h)
+    )
+
+# precomputed once per worker: the table every request is matched against
+TONE_LAB = linear_to_lab(_to_linear(np.array([_hex_rgb(h) for _, h in TONES]) / 255.0))
+
+# ----------------- Input decoding -----------------
+def _check_size(width, height):
+    if width < 4 or height < 4:
+        raise ValueError("Image crop is too small")
+    if width > MAX_SIDE or height > MAX_SIDE:
+        raise ValueError(f"Image crop must be at most {MAX_SIDE}x{MAX_SIDE} pixels")
+
+def from_rgba(data):
+    """
+    Pixels from a JSON body: {"pixels": base64 RGBA bytes (canvas getImageData),
+    "width": w, "height": h}. Returns an (h, w, 3) uint8 array.
+    """
+    try:
+        width, height = int(data.get("width")), int(data.get("height"))
+        raw = base64.b64decode(data.get("pixels") or "", validate=True)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError("pixels (base64 RGBA), width and height are required")
+    _check_size(width, height)
+    if len(raw) != width * height * 4:
+        raise ValueError("pixels length does not match width x height x 4")
+    return np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4)[..., :3]
+
+def from_image(raw: bytes):
+    """Pixels from an encoded image (PNG/JPEG upload or data URL), downscaled to MAX_SIDE."""
+    try:
+        # Pillow is optional and only loaded for this path
+        from PIL import Image
+    except ImportError:
+        raise ValueError("Encoded images are not supported here; send raw RGBA pixels")
+    try:
+        # open() only parses the header; the size is known before any pixel is decoded
+        img = Image.open(io.BytesIO(raw))
+    except Exception:
+        raise ValueError("Could not decode image")
+    if img.width * img.height > MAX_SOURCE_PIXELS:
+        raise ValueError(f"Image must be at most {MAX_SOURCE_PIXELS} pixels")
+    try:
+        # JPEG can decode straight to a reduced size, skipping most of the work
+        img.draft("RGB", (MAX_SIDE, MAX_SIDE))
+        img = img.convert("RGB")
+    except Exception:
+        raise ValueError("Could not decode image")
+    img.thumbnail((MAX_SIDE, MAX_SIDE))
+    _check_size(*img.size)
+    return np.asarray(img, dtype=np.uint8)
+
+def from_payload(data):
+    """JSON body: either raw RGBA pixels or "image" as a base64 data URL."""
+    image = data.get("image")
+    if isinstance(image, str) and image:
+        try:
+            raw = base64.b64decode(image.split(",", 1)[-1], validate=True)
+        except (ValueError, binascii.Error):
+            raise ValueError("image must be base64 encoded")
+        return from_image(raw)
+    return from_rgba(data)
+
+def parse_patch(value):
+    if value in (None, ""):
+        return DEFAULT_PATCH
+    try:
+        patch = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("patch must be a number")
+    if not 0.05 <= patch <= 1.0:
+        raise ValueError("patch must be between 0.05 and 1")
+    return patch
+
+# ----------------- Matching -----------------
+def _illuminant(surround, skin_lab):
+    """
+    Shades-of-gray (p=6) estimate, normalized to mean 1, over the surround pixels
+    that are unclipped and near-neutral relative to the skin sample. None when
+    too few qualify, i.e. the surround looks like more skin.
+    """
+    level = surround.max(axis=1)
+    surround = surround[(level < 0.95) & (level > 0.01)]
+    if len(surround) < 16:
+        return None
+    lab = linear_to_lab(surround)
+    skin_ab = skin_lab[:, 1:].mean(axis=0)
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    neutral = surround[
+        (chroma < np.hypot(*skin_ab))
+        & (np.hypot(*(lab[:, 1:] - skin_ab).T) > NEUTRAL_SEPARATION)
+    ]
+    if len(neutral) < max(16, MIN_NEUTRAL_FRACTION * len(surround)):
+        return None
+    estimate = np.mean(neutral ** 6, axis=0) ** (1 / 6)
+    return estimate / estimate.mean()
+
+@lru_cache(maxsize=4096)
+def _match(L, a, b):
+    distances = delta_e_2000(np.array([L, a, b]), TONE_LAB)
+    index = int(np.argmin(distances))
+    return index, float(distances[index])
+
+def match(lab):
+    """(tone index, ΔE2000) for a Lab colour; memoized on the LAB_STEP grid."""
+    q = np.round(np.asarray(lab) / LAB_STEP) * LAB_STEP
+    return _match(float(q[0]), float(q[1]), float(q[2]))
+
+def analyze(pixels, patch=DEFAULT_PATCH):
+    """
+    Match the centre patch of an (h, w, 3) uint8 frame against TONES.
+    When the frame has a surround (patch < 1) it white-balances the patch first.
+    """
+    height, width, _ = pixels.shape
+    side = max(2, int(round(min(width, height) * patch)))
+    top, left = (height - side) // 2, (width - side) // 2
+    inside = np.zeros((height, width), dtype=bool)
+    inside[top:top + side, left:left + side] = True
+
+    linear = _to_linear(pixels.astype(np.float64) / 255.0)
+    skin = linear[inside]
+
+    lab = linear_to_lab(skin)
+    illuminant = _illuminant(linear[~inside], lab) if patch < 1 else None
+    if illuminant is not None:
+        skin = skin * np.clip(1 / illuminant, 1 / MAX_GAIN, MAX_GAIN)
+        lab = linear_to_lab(skin)
+
+    # drop shadows and specular highlights before averaging
+    lo, hi = np.percentile(lab[:, 0], [10, 90])
+    kept = lab[(lab[:, 0] >= lo) & (lab[:, 0] <= hi)]
+    sample = (kept if len(kept) else lab).mean(axis=0)
+
+    index, delta_e = match(sample)
+    name, hex_value = TONES[index]
+    sample_rgb = np.round(_to_srgb(skin.mean(axis=0)) * 255).astype(int)
+    return {
+        "skin_tone": name,
+        "hex": hex_value,
+        "slider": round(index * 100 / (len(TONES) - 1)),
+        "delta_e": round(delta_e, 2),
+        "sample": "#{:02x}{:02x}{:02x}".format(*sample_rgb),
+        "white_balanced": illuminant is not None,
+    }
+
+def self_check():
+    """Every swatch, alone or on a gray surround, must map to its own bucket."""
+    failures = []
+    for name, hex_value in TONES:
+        # a uniform close-up (sampled with and without a surround) and a gray backdrop
+        for surround, patch in ((hex_value, DEFAULT_PATCH), (hex_value, 1.0), ("#808080", DEFAULT_PATCH)):
+            frame = np.empty((60, 60, 3), dtype=np.uint8)
+            frame[:] = _hex_rgb(surround)
+            frame[21:39, 21:39] = _hex_rgb(hex_value)
+            result = analyze(frame, patch)
+            if result["skin_tone"] != name:
+                failures.append(f"{name} on {surround} (patch={patch}): {result}")
+    return failures
+
+if __name__ == "__main__":
+    problems = self_check()
+    print("\n".join(problems) or f"all {len(TONES)} swatches map to themselves")
+    raise SystemExit(1 if problems else 0)